@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+import argparse
+import atexit
+import contextlib
+import hashlib
+import http.server
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+'''
+###########################################
+# PURPOSE: times each stage of a cycle    #
+#          against local stand-ins for    #
+#          aviationweather.gov and        #
+#          WeatherLink, so slowdowns in   #
+#          the loop can be caught offline #
+###########################################
+'''
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, 'fixtures')
+
+# How many milliseconds each module gets to import in a fresh interpreter, everything it imports included. The core
+# is what the view and the command line tools load, so it has to stay quick
+IMPORT_BUDGET_MS = {'WX_Rules': 10,
+                    'WX_Observation': 15,
+                    'WX_Metar': 20,
+                    'WX_Taf': 20,
+                    'WX_Model': 40,
+                    'WX_Server': 80}           # http.server alone is most of this
+
+
+'''
+Serves the fixtures the way the real sites would: the METARs (raw or geojson), the TAFs, the WeatherLink summary
+data and the static WeatherLink summary page. Every response has an ETag, and a matching If-None-Match gets a 304, like the real
+thing.
+'''
+class Stub_Handler(http.server.BaseHTTPRequestHandler):
+
+    delay = 0.0         # seconds to wait before answering, to stand in for the network
+    files = {'/api/data/metar?format=raw': ('metar.txt', 'text/plain'),
+             '/api/data/metar': ('metar.geojson', 'application/geo+json'),
+             '/api/data/taf': ('taf.txt', 'text/plain'),
+             '/embeddablePage/summaryData': ('weatherlink_summary.json', 'application/json'),
+             '/embeddablePage/show': ('weatherlink_summary.html', 'text/html; charset=utf-8')}
+    bodies = {}         # the fixture contents and their ETags, by file name
+
+    def do_GET(self):
+
+        time.sleep(self.delay)
+
+        for prefix, (name, content_type) in self.files.items():
+            if self.path.startswith(prefix):
+                break
+        else:
+            self.send_error(404)
+            return
+
+        if name not in self.bodies:
+            with open(os.path.join(FIXTURES, name), 'rb') as fixture:
+                body = fixture.read()
+            self.bodies[name] = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        body, etag = self.bodies[name]
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # keep the benchmark output clean
+    def log_message(self, format, *args):
+        pass
+
+'''
+Starts the stub sites on a free local port. Returns the server and its base url
+'''
+def Start_Stub(delay=0.0):
+
+    handler = type('Delayed_Stub_Handler', (Stub_Handler,), {'delay': delay})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+'''
+Gets the pth percentile from sorted times
+'''
+def Percentile(times, p):
+    return times[min(len(times) - 1, int(round(p / 100 * (len(times) - 1))))]
+
+'''
+Runs a stage over and over. Timing and memory are measured on separate runs, since tracemalloc slows everything down.
+Returns the stats in milliseconds, runs per second and KiB.
+'''
+def Measure(stage, iterations, warmup, memory_runs):
+
+    for _ in range(warmup):
+        stage()
+
+    times = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    times.sort()
+
+    tracemalloc.start()
+    for _ in range(memory_runs):
+        stage()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'runs': iterations,
+            'p50_ms': Percentile(times, 50) * 1000,
+            'p90_ms': Percentile(times, 90) * 1000,
+            'p99_ms': Percentile(times, 99) * 1000,
+            'max_ms': times[-1] * 1000,
+            'per_second': iterations / total,
+            'peak_kib': peak / 1024}
+
+'''
+Measures how long a module takes to import in a fresh interpreter, with python -X importtime. The best of runs is
+kept, since the first one may be compiling. Returns milliseconds
+'''
+def Import_Time(module, runs=5):
+
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=HERE, capture_output=True, text=True, check=True)
+
+        # each line is 'import time: self | cumulative | name', and the module we asked for is the only one at the top
+        for line in result.stderr.splitlines():
+            parts = line.split('|')
+            if (len(parts) == 3) and (parts[2].rstrip() == ' ' + module):
+                cumulative = int(parts[1]) / 1000
+                best = cumulative if best is None else min(best, cumulative)
+
+    return best
+
+'''
+Builds a controller pointed at the stub sites. The history goes in a throwaway directory that's deleted on exit. The
+shared cache is off unless cache is set, in which case it's a throwaway file too, so every pull still reaches the stub.
+'''
+def Make_Controller(base, backend, cache=False):
+
+    scratch = tempfile.TemporaryDirectory(prefix='wx_bench_')
+    atexit.register(scratch.cleanup)
+    os.environ['WX_TEALHQ_BACKEND'] = backend
+    os.environ['WX_HISTORY_DIR'] = scratch.name
+    os.environ['WX_CACHE'] = os.path.join(scratch.name, 'cache.sqlite3') if cache else 'off'
+
+    import WX_Model
+
+    with open(os.path.join(FIXTURES, 'metar.geojson')) as fixture:
+        stations = [feature['properties']['id'] for feature in json.load(fixture)['features']]
+
+    G = WX_Model.WX_Controller()
+    G.Stations = stations
+    G.METAR_URL = base + '/api/data/metar?format={format}&ids={ids}&taf=false'
+    G.TAF_URL = base + '/api/data/taf?ids={ids}&format=raw'
+    G.TealHQ_Data_URL = base + '/embeddablePage/summaryData/fixture'
+    G.TealHQ_Page_URL = base + '/embeddablePage/show/fixture/summary'
+
+    return G
+
+
+'''
+Prints how long each stage takes
+'''
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark a cycle against local stand-ins for the weather sites")
+    parser.add_argument('--iterations', type=int, default=200, help="timed runs per stage")
+    parser.add_argument('--warmup', type=int, default=5, help="untimed runs per stage first")
+    parser.add_argument('--memory-runs', type=int, default=20, help="runs per stage under tracemalloc")
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds the stub sites wait before answering")
+    parser.add_argument('--backend', default='http', choices=('http', 'selenium'), help="the Teal HQ backend")
+    parser.add_argument('--cache', action='store_true', help="pull through a shared cache, as kiosks do")
+    parser.add_argument('--imports', action='store_true', help="check the import times against their budget instead")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    if args.imports:
+        times = {module: Import_Time(module) for module in IMPORT_BUDGET_MS}
+        over = [module for module, ms in times.items() if ms > IMPORT_BUDGET_MS[module]]
+
+        if args.json:
+            print(json.dumps({module: {'ms': ms, 'budget_ms': IMPORT_BUDGET_MS[module]} for module, ms in times.items()},
+                             indent=2))
+        else:
+            print(f"{'module':<16}{'ms':>10}{'budget':>10}")
+            for module, ms in times.items():
+                print(f"{module:<16}{ms:>10.1f}{IMPORT_BUDGET_MS[module]:>10}{'  OVER' if module in over else ''}")
+
+        sys.exit(1 if over else 0)
+
+    server, base = Start_Stub(args.delay)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        G = Make_Controller(base, args.backend, args.cache)
+
+    from WX_Render import WX_Render
+    R = WX_Render()
+
+    stages = (('Pull', G.Pull),
+              ('Pull_Stations', G.Pull_Stations),
+              ('Pull_TealHQ', G.Pull_TealHQ),
+              ('Pull_TAFs', G.Pull_TAFs),
+              ('Changed', G.Changed),
+              ('Analyze', G.Analyze),
+              ('Record_History', G.Record_History),
+              ('Give_To_Display', G.Give_To_Display),
+              ('Render', lambda: R.Render(G.Give_To_Display())),
+              ('Forecast', lambda: G.Forecast(G.Station_TAFs[G.Stations[0]][0].valid_from + 7200)))
+
+    results = {}
+    for name, stage in stages:
+        # the stages print as they go, which would bury the results
+        with open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+            results[name] = Measure(stage, args.iterations, args.warmup, args.memory_runs)
+
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{len(G.Stations)} stations, {args.iterations} runs per stage, {args.delay * 1000:.0f} ms stub delay")
+        print(f"{'stage':<16}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'runs/s':>12}{'peak KiB':>12}")
+        for name, r in results.items():
+            print(f"{name:<16}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}"
+                  f"{r['per_second']:>12.1f}{r['peak_kib']:>12.1f}")
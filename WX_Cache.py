@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+
+'''
+###########################################
+# PURPOSE: a cache of observations that   #
+#          every process on the host      #
+#          shares, so kiosks and scripts  #
+#          don't each hit the weather     #
+#          sites on their own             #
+###########################################
+'''
+
+'''
+Turns the lists json gives back into tuples, all the way down, so cached observations come back like the originals
+'''
+def Tuples(value):
+
+    if isinstance(value, (list, tuple)):
+        return tuple(Tuples(item) for item in value)
+
+    return value
+
+
+'''
+Observations kept in a SQLite file by key (e.g. 'METAR:KSLC,KOGD'), each with a time to live. When an entry goes
+stale, one process takes a lease on it and refreshes it while the others wait for the new value, instead of all of
+them going to the website at once. Values have to be something json can store.
+'''
+class WX_Cache:
+
+    # initialize class fields
+    lease_time = 30             # Seconds a refresh gets before another process may take over
+    poll = 0.1                  # Seconds between looks while waiting on another process's refresh
+    keep_stale = 24 * 3600      # Seconds to keep an expired entry around before evicting it
+    max_entries = 1000          # Past this many entries, the oldest are evicted
+
+    '''
+    Parameter:
+        path is the cache file (WX_CACHE, or wx_cache.sqlite3 in the temp directory, is default)
+    '''
+    def __init__(self, path=None):
+
+        if path is None:
+            import tempfile
+            path = os.environ.get('WX_CACHE', os.path.join(tempfile.gettempdir(), 'wx_cache.sqlite3'))
+
+        self.path = path
+        self.holder = os.urandom(16).hex()      # who we are when we hold a lease
+        self.local = threading.local()          # a connection per thread, since SQLite won't share them
+
+        with self.Connection() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, stored REAL, expires REAL)')
+            db.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, holder TEXT, until REAL)')
+
+    '''
+    Gets this thread's connection to the cache file, opening it the first time
+    '''
+    def Connection(self):
+
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            import sqlite3      # only loaded once there's a cache to open
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self.local.db = db
+
+        return db
+
+    '''
+    Gets an entry. Returns (value, fresh), or (None, False) if there isn't one
+    '''
+    def Get(self, key):
+
+        row = self.Connection().execute('SELECT value, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None, False
+
+        return json.loads(row[0]), row[1] > time.time()
+
+    '''
+    Stores an entry for ttl seconds
+    '''
+    def Put(self, key, value, ttl):
+
+        now = time.time()
+        db = self.Connection()
+        db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', (key, json.dumps(value), now, now + ttl))
+        self.Evict(now)
+
+    '''
+    Drops entries that expired long ago, and the oldest ones if there are too many
+    '''
+    def Evict(self, now=None):
+
+        now = now or time.time()
+        db = self.Connection()
+        db.execute('DELETE FROM entries WHERE expires < ?', (now - self.keep_stale,))
+        db.execute('DELETE FROM entries WHERE key NOT IN (SELECT key FROM entries ORDER BY stored DESC LIMIT ?)',
+                   (self.max_entries,))
+        db.execute('DELETE FROM leases WHERE until < ?', (now,))
+
+    '''
+    Tries to take the lease on a key. True if we got it
+    '''
+    def Take_Lease(self, key):
+
+        now = time.time()
+        db = self.Connection()
+
+        # BEGIN IMMEDIATE locks the file for writing, so only one process can look and take at a time
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT holder, until FROM leases WHERE key = ?', (key,)).fetchone()
+            if (row is not None) and (row[0] != self.holder) and (row[1] > now):
+                db.execute('COMMIT')
+                return False
+
+            db.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?)', (key, self.holder, now + self.lease_time))
+            db.execute('COMMIT')
+            return True
+        except:
+            db.execute('ROLLBACK')
+            raise
+
+    '''
+    Gives the lease on a key back
+    '''
+    def Release_Lease(self, key):
+        self.Connection().execute('DELETE FROM leases WHERE key = ? AND holder = ?', (key, self.holder))
+
+    '''
+    Gets a fresh value for a key. If the cached one is stale, whichever process gets the lease calls refresh and
+    stores what it returns, and everyone else waits for that. A refresh that returns None isn't stored.
+
+    Parameters:
+        ttl is how many seconds a refreshed value stays fresh
+        refresh gets a new value from the website
+        deadline is the time.monotonic() to stop waiting by. If it runs out the stale value (or None) comes back
+    '''
+    def Get_Or_Refresh(self, key, ttl, refresh, deadline=None):
+
+        while True:
+            value, fresh = self.Get(key)
+            if fresh:
+                return value
+
+            if self.Take_Lease(key):
+                try:
+                    # someone may have finished a refresh between our look and taking the lease
+                    value, fresh = self.Get(key)
+                    if fresh:
+                        return value
+
+                    new = refresh()
+                    if new is None:
+                        return value
+
+                    self.Put(key, new, ttl)
+                    return new
+                finally:
+                    self.Release_Lease(key)
+
+            if (deadline is not None) and (time.monotonic() + self.poll > deadline):
+                return value
+
+            time.sleep(self.poll)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import tkinter as tk
+
+from PIL import ImageTk
+
+'''
+###########################################
+# PURPOSE: puts the frames WX_Render      #
+#          draws on the kiosk's screen,   #
+#          copying over only the boxes    #
+#          that changed                   #
+###########################################
+'''
+
+'''
+A window showing WX_Render's frames. The screen is made of tiles, one Tk image per box that's ever been shown, so
+Show only copies the boxes that changed into their tiles and Tk only repaints those. A tile that's just been shown is
+raised above the others, so boxes can overlap.
+'''
+class WX_Display:
+
+    # initialize class fields
+    fullscreen = os.environ.get('WX_FULLSCREEN', '1') != '0'   # WX_FULLSCREEN=0 shows a window instead
+    title = 'Teal Weather'
+    tick = 0.05                 # seconds between handling window events while Wait waits
+
+    '''
+    Opens the window
+
+    Parameter:
+        size is the screen's size in pixels, the same as WX_Render's
+    '''
+    def __init__(self, size=(800, 480)):
+
+        self.size = size
+        self.tiles = {}             # (Tk image, canvas item) for each box, by box
+
+        self.root = tk.Tk()
+        self.root.title(self.title)
+        self.root.configure(background='black', cursor='none' if self.fullscreen else '')
+        self.root.protocol('WM_DELETE_WINDOW', self.Close)
+        if self.fullscreen:
+            self.root.attributes('-fullscreen', True)
+
+        self.canvas = tk.Canvas(self.root, width=size[0], height=size[1], highlightthickness=0, background='black')
+        self.canvas.pack(expand=True)
+        self.root.update()
+
+    '''
+    Shows a frame. Only the boxes in dirty are copied to the screen, so they have to cover everything that changed
+    since the last frame shown. Raises SystemExit once the window's been closed
+
+    Parameters:
+        frame is the PIL image from WX_Render
+        dirty are the (left, top, right, bottom) boxes that changed (the whole frame is default)
+    '''
+    def Show(self, frame, dirty=None):
+
+        if self.root is None:
+            raise SystemExit("The display was closed")
+
+        if dirty is None:
+            dirty = [(0, 0) + frame.size]
+
+        for box in dirty:
+            box = tuple(box)
+            if box in self.tiles:
+                tile, item = self.tiles[box]
+                tile.paste(frame.crop(box))
+                self.canvas.tag_raise(item)
+            else:
+                tile = ImageTk.PhotoImage(frame.crop(box))
+                item = self.canvas.create_image(box[0], box[1], image=tile, anchor='nw')
+                self.tiles[box] = (tile, item)
+
+        self.root.update_idletasks()
+
+    '''
+    Waits, keeping the window responsive. Raises SystemExit once the window's been closed
+
+    Parameter:
+        seconds is how long to wait
+    '''
+    def Wait(self, seconds):
+
+        end = time.monotonic() + seconds
+        while True:
+            if self.root is None:
+                raise SystemExit("The display was closed")
+
+            self.root.update()
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(self.tick, remaining))
+
+    '''
+    Closes the window
+    '''
+    def Close(self):
+
+        if self.root is not None:
+            self.root.destroy()
+            self.root = None
+            self.tiles = {}
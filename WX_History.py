@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import bisect
+import fcntl
+import math
+import mmap
+import os
+import struct
+
+import WX_Rules
+
+'''
+###########################################
+# PURPOSE: keeps every Pull cycle's       #
+#          observations and status on     #
+#          disk so past go/no-go calls    #
+#          can be looked back over        #
+###########################################
+'''
+
+'''
+An append-only table kept as one file per column. Every value in a column is the same fixed width, so row i is at
+byte i * width of each file. Reads go through memory maps, so only the pages that are looked at get loaded.
+Rows have to be appended in time order.
+
+Several processes can share a store (kiosks, scripts and WX_Server all record history). Appending takes a lock on
+the store's .lock file, so rows never interleave, and every reader works out how many rows there are from the files
+rather than trusting its own count.
+'''
+class Column_Store:
+
+    '''
+    Opens (or starts) a store in a directory.
+
+    Parameters:
+        path is the directory the column files go in
+        columns are (name, struct format) pairs. The first column has to be the time
+    '''
+    def __init__(self, path, columns):
+
+        self.path = path
+        self.columns = columns
+        self.names = [name for name, fmt in columns]
+        self.files = {}         # open append handles, by column
+        self.maps = {}          # (mmap, memoryview) for reading, by column
+        self.count = 0          # how many whole rows are in the store, as of the last Refresh
+
+        os.makedirs(path, exist_ok=True)
+        self.lock = open(os.path.join(path, '.lock'), 'ab')
+
+        for name, fmt in columns:
+            self.files[name] = open(os.path.join(path, name + '.col'), 'ab')
+
+        # if we went down in the middle of writing a row, some columns will be longer than others. Cut them all
+        # back to the last whole row, while nobody else is writing
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            self.Refresh()
+            for name, fmt in columns:
+                self.files[name].truncate(self.count * struct.calcsize(fmt))
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return self.Refresh()
+
+    '''
+    Counts the whole rows in the files, including any another process has appended. A row is whole once its last
+    column is written, so it's the shortest column. Returns the count
+    '''
+    def Refresh(self):
+
+        self.count = min(os.fstat(self.files[name].fileno()).st_size // struct.calcsize(fmt)
+                         for name, fmt in self.columns)
+        return self.count
+
+    '''
+    Adds a row to the end of the store. If another process got a later row in first, this one's time is moved up to
+    match it, so the times stay in order for Range
+
+    Parameter:
+        row has one value per column, in column order
+    '''
+    def Append(self, row):
+
+        fcntl.flock(self.lock, fcntl.LOCK_EX)
+        try:
+            if self.Refresh():
+                last = self.Column(self.names[0])[-1]
+                if row[0] < last:
+                    row = [last] + list(row[1:])
+
+            for (name, fmt), value in zip(self.columns, row):
+                self.files[name].write(struct.pack(fmt, value))
+
+            for handle in self.files.values():
+                handle.flush()
+        finally:
+            fcntl.flock(self.lock, fcntl.LOCK_UN)
+
+        self.count += 1
+
+    '''
+    Gets a read-only view of a column, remapping the file if it has grown since the last look
+    '''
+    def Column(self, name):
+
+        fmt = self.columns[self.names.index(name)][1]
+        width = struct.calcsize(fmt)
+
+        # the old map is left for the garbage collector, since views of it may still be out there
+        current = self.maps.get(name)
+        if (current is None) or (len(current[1]) < self.count):
+            if self.count == 0:
+                return memoryview(b'').cast(fmt)
+
+            with open(os.path.join(self.path, name + '.col'), 'rb') as handle:
+                mapped = mmap.mmap(handle.fileno(), self.count * width, access=mmap.ACCESS_READ)
+            current = (mapped, memoryview(mapped).cast(fmt))
+            self.maps[name] = current
+
+        return current[1][:self.count]
+
+    '''
+    Gets rows start through end - 1 as lists, by column
+
+    Parameter:
+        names are the columns to get (all of them is default)
+    '''
+    def Rows(self, start, end, names=None):
+        return {name: self.Column(name)[start:end].tolist() for name in (names or self.names)}
+
+    '''
+    Gets every row with a time from start up to (not including) end. Times are found by binary search, so only
+    the rows that are asked for are read.
+    '''
+    def Range(self, start, end, names=None):
+
+        self.Refresh()
+        times = self.Column(self.names[0])
+        return self.Rows(bisect.bisect_left(times, start), bisect.bisect_left(times, end), names)
+
+    '''
+    Gets the newest n rows
+    '''
+    def Latest(self, n, names=None):
+        self.Refresh()
+        return self.Rows(max(0, self.count - n), self.count, names)
+
+    '''
+    Closes the files
+    '''
+    def Close(self):
+
+        self.maps = {}
+
+        for handle in self.files.values():
+            handle.close()
+        self.files = {}
+        self.lock.close()
+
+
+'''
+The history of every station, one Column_Store each.
+'''
+class WX_History:
+
+    # The columns kept for every cycle. Wind and gust are knots, Teal HQ's are mph, temperatures are what the source
+    # reports. Anything that wasn't reported is NaN. rule is the entry in WX_Rules.RULES the status came from
+    COLUMNS = (('time', 'd'),           # seconds since the epoch
+               ('ceiling', 'f'),        # feet
+               ('visibility', 'f'),     # statute miles
+               ('wind', 'f'),
+               ('gust', 'f'),
+               ('wind_dir', 'f'),       # degrees
+               ('temp', 'f'),
+               ('dewp', 'f'),
+               ('teal_wind', 'f'),
+               ('teal_gust', 'f'),
+               ('rule', 'B'))
+
+    ERROR = 255                         # the rule for a cycle that couldn't be analyzed
+
+    # where each (status, background_color, word_colors) is in WX_Rules.RULES
+    rule_codes = {rule: i for i, rule in enumerate(WX_Rules.RULES)}
+
+    '''
+    Parameter:
+        root is the directory to keep the history in (WX_HISTORY_DIR, or history next to this file, is default)
+    '''
+    def __init__(self, root=None):
+
+        if root is None:
+            root = os.environ.get('WX_HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history'))
+
+        self.root = root
+        self.stores = {}
+
+    '''
+    Gets the store for a station, opening it the first time
+    '''
+    def Store(self, station):
+
+        if station not in self.stores:
+            self.stores[station] = Column_Store(os.path.join(self.root, station), self.COLUMNS)
+
+        return self.stores[station]
+
+    '''
+    Adds a cycle for a station
+
+    Parameters:
+        values are the observation by column name. Columns that are left out are saved as NaN
+        status is the (status, background_color, word_colors) the cycle ended up with
+    '''
+    def Append(self, station, t, values, status):
+
+        rule = self.rule_codes.get((status[0], status[1], tuple(status[2])), self.ERROR)
+
+        row = [t]
+        for name, fmt in self.COLUMNS[1:-1]:
+            value = values.get(name)
+            row.append(math.nan if value is None else value)
+        row.append(rule)
+
+        self.Store(station).Append(row)
+
+    '''
+    Gets a station's cycles from start up to end (seconds since the epoch), as lists by column
+    '''
+    def Range(self, station, start, end, names=None):
+        return self.Store(station).Range(start, end, names)
+
+    '''
+    Gets a station's newest n cycles, as lists by column
+    '''
+    def Latest(self, station, n, names=None):
+        return self.Store(station).Latest(n, names)
+
+    '''
+    Turns a rule column value back into (status, background_color, word_colors)
+    '''
+    def Status(self, rule):
+
+        if rule == self.ERROR:
+            return ('Error', 'grey', (None, None, None, None))
+
+        return WX_Rules.RULES[rule]
+
+    '''
+    Closes every station's files
+    '''
+    def Close(self):
+
+        for store in self.stores.values():
+            store.Close()
+        self.stores = {}
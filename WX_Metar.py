@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import datetime
+import re
+
+import WX_Rules
+from WX_Observation import METAR_Observation
+
+'''
+###########################################
+# PURPOSE: reads raw METARs straight into #
+#          METAR_Observations, fast       #
+#          enough for bulk and archive    #
+#          use                            #
+###########################################
+'''
+
+# every pattern is compiled once, up front
+_wind = re.compile(r'(\d{3}|VRB)(\d{2,3})(?:G(\d{2,3}))?(KT|MPS)$')
+_variable = re.compile(r'(\d{3})V(\d{3})$')
+_visibility = re.compile(r'([PM])?(?:(\d+)/(\d+)|(\d+))SM$')
+_sky = re.compile(r'(FEW|SCT|BKN|OVC|VV)(\d{3}|///)')
+_temperature = re.compile(r'(M?\d{2})/(M?\d{2})?$')
+_precise_temperature = re.compile(r'T([01])(\d{3})([01])(\d{3})$')
+_time = re.compile(r'(\d{2})(\d{2})(\d{2})Z$')
+
+KNOTS_PER_MPS = 1.943844
+METERS_PER_MILE = 1609.344
+
+CEILING_COVERS = ('BKN', 'OVC', 'VV')      # the layers that count as a ceiling
+
+
+'''
+Turns a METAR temperature like M05 into a number
+'''
+def _degrees(text):
+    return -float(text[1:]) if text[0] == 'M' else float(text)
+
+'''
+Turns a METAR's DDHHMMZ time into an ISO time like the geojson's obsTime. The METAR doesn't say the month, so it's
+the latest one that has that day in it, as of now.
+
+Parameter:
+    now is the time to count back from (the current UTC time is default)
+'''
+def Observation_Time(text, now=None):
+
+    match = _time.match(text)
+    if match is None:
+        return None
+
+    day, hour, minute = (int(group) for group in match.groups())
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    year, month = now.year, now.month
+
+    # a day later than today is from last month. Keep going back for days the month doesn't have
+    for _ in range(12):
+        if (year, month, day) <= (now.year, now.month, now.day):
+            try:
+                return datetime.datetime(year, month, day, hour, minute, tzinfo=datetime.timezone.utc) \
+                    .strftime('%Y-%m-%dT%H:%M:%SZ')
+            except ValueError:
+                pass
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+
+    return None
+
+'''
+Reads a raw METAR into a METAR_Observation. Anything it doesn't recognize is skipped, and anything that isn't in the
+report is None, just like the geojson.
+
+Parameter:
+    raw is the METAR, with or without METAR/SPECI in front, e.g. 'KSLC 251854Z 32005G15KT 1 1/2SM BKN008 08/M03 A3012'
+'''
+def Parse_METAR(raw, now=None):
+
+    tokens = raw.split()
+    count = len(tokens)
+    i = 0
+
+    if (i < count) and (tokens[i] in ('METAR', 'SPECI')):
+        i += 1
+
+    station = tokens[i] if i < count else None
+    i += 1
+
+    obs_time = None
+    if (i < count) and tokens[i].endswith('Z'):
+        obs_time = Observation_Time(tokens[i], now)
+        i += 1
+
+    wind = gust = direction = variable = visibility = temp = dewp = remarks = None
+    ceiling = float(WX_Rules.UNLIMITED_CEILING)
+    layers = []
+    whole_miles = 0
+
+    while i < count:
+        token = tokens[i]
+        i += 1
+
+        if token == 'RMK':
+            remarks = ' '.join(tokens[i:])
+            break
+
+        first = token[0]
+
+        # wind, e.g. 32005G15KT or VRB03KT
+        if (wind is None) and token.endswith(('KT', 'MPS')):
+            match = _wind.match(token)
+            if match is not None:
+                scale = KNOTS_PER_MPS if match.group(4) == 'MPS' else 1.0
+                direction = None if match.group(1) == 'VRB' else float(match.group(1))
+                wind = float(match.group(2)) * scale
+                gust = float(match.group(3)) * scale if match.group(3) else None
+                continue
+
+        # variable wind direction, e.g. 280V350
+        if (len(token) == 7) and (token[3] == 'V'):
+            match = _variable.match(token)
+            if match is not None:
+                variable = (float(match.group(1)), float(match.group(2)))
+                continue
+
+        # visibility in statute miles, e.g. 10SM, P6SM, 1/2SM, or 1 1/2SM over two tokens
+        if token.endswith('SM'):
+            match = _visibility.match(token)
+            if match is not None:
+                if match.group(4) is not None:
+                    visibility = float(match.group(4))
+                else:
+                    visibility = whole_miles + int(match.group(2)) / int(match.group(3))
+                whole_miles = 0
+                continue
+
+        if token.isdigit():
+            # the whole miles of a visibility like 1 1/2SM
+            if (len(token) == 1) and (i < count) and tokens[i].endswith('SM'):
+                whole_miles = int(token)
+                continue
+
+            # visibility in meters, 9999 meaning 10 km or more
+            if (len(token) == 4) and (visibility is None):
+                visibility = float(token) / METERS_PER_MILE
+                continue
+
+        # sky condition, e.g. BKN008 or VV002
+        if first in 'FSBOV':
+            match = _sky.match(token)
+            if match is not None:
+                height = None if match.group(2) == '///' else float(match.group(2)) * 100
+                layers.append((match.group(1), height))
+                if match.group(1) in CEILING_COVERS:
+                    # layers go from the lowest up, so a ceiling of unknown height (OVC///) is only known not to be
+                    # the ceiling if one's already been found under it. Otherwise the ceiling is unknown, not unlimited
+                    if height is None:
+                        if ceiling == WX_Rules.UNLIMITED_CEILING:
+                            ceiling = None
+                    elif (ceiling is not None) and (height < ceiling):
+                        ceiling = height
+                continue
+
+        if token == 'CAVOK':
+            visibility = 10.0
+            continue
+
+        # temperature and dew point, e.g. 08/M03
+        if '/' in token:
+            match = _temperature.match(token)
+            if match is not None:
+                temp = _degrees(match.group(1))
+                dewp = _degrees(match.group(2)) if match.group(2) else None
+                continue
+
+    # the remarks have the temperature and dew point to a tenth of a degree, e.g. T00831028
+    if remarks is not None:
+        for token in remarks.split():
+            if token[0] == 'T':
+                match = _precise_temperature.match(token)
+                if match is not None:
+                    temp = (-1 if match.group(1) == '1' else 1) * int(match.group(2)) / 10
+                    dewp = (-1 if match.group(3) == '1' else 1) * int(match.group(4)) / 10
+                    break
+
+    return METAR_Observation(ceiling_ft=ceiling,
+                             visibility_sm=visibility,
+                             wind_kt=wind,
+                             gust_kt=gust,
+                             wind_dir_deg=direction,
+                             temp_c=temp,
+                             dewp_c=dewp,
+                             raw=raw,
+                             station=station,
+                             obs_time=obs_time,
+                             wind_variable_deg=variable,
+                             layers=tuple(layers),
+                             remarks=remarks)
+
+'''
+Reads every METAR in text, one per line, like the API's format=raw. Returns a list of METAR_Observations
+'''
+def Parse_Many(text, now=None):
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return [Parse_METAR(line, now) for line in text.splitlines() if line.strip()]
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import threading
+import time
+
+'''
+###########################################
+# PURPOSE: keeps timings and counts for   #
+#          every stage of a cycle, and    #
+#          hands them out as Prometheus   #
+#          text or JSON                   #
+###########################################
+'''
+
+'''
+Escapes a label value the way Prometheus's text format wants
+'''
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+'''
+How a stage went. Time hands one of these out, and the stage can set result if it failed without raising
+'''
+class Timing:
+
+    def __init__(self):
+        self.result = 'ok'
+
+
+'''
+Latency histograms by stage, and counters by name and labels. Everything is safe to use from the pull threads.
+
+The histograms are cumulative like Prometheus's: each bucket counts the runs that took up to that many seconds.
+'''
+class WX_Metrics:
+
+    # initialize class fields
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)     # seconds
+    prefix = 'wx'               # goes in front of every metric's name
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.histograms = {}        # [count per bucket..., runs past the last bucket, total seconds], by stage
+        self.counters = {}          # by (name, labels), where labels are (label, value) pairs
+
+    '''
+    Records how many seconds a stage took
+    '''
+    def Observe(self, stage, seconds):
+
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = [0] * (len(self.BUCKETS) + 1) + [0.0]
+
+            histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+
+    '''
+    Adds to a counter, e.g. Count('requests', site='aviationweather.gov', result='ok')
+    '''
+    def Count(self, name, amount=1, **labels):
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    '''
+    Times a stage, for use in a with. The run's counted under stage_total with its result: 'ok', 'error' if it raised,
+    or whatever the stage set on the Timing it's handed
+    '''
+    def Time(self, stage):
+        return _Timer(self, stage)
+
+    '''
+    Gets everything as Prometheus's text format
+    '''
+    def Prometheus(self):
+
+        with self.lock:
+            histograms = {stage: list(histogram) for stage, histogram in self.histograms.items()}
+            counters = dict(self.counters)
+
+        lines = []
+        name = f'{self.prefix}_stage_seconds'
+        lines.append(f'# HELP {name} How long each stage of a cycle takes')
+        lines.append(f'# TYPE {name} histogram')
+        for stage, histogram in sorted(histograms.items()):
+            total = 0
+            for edge, count in zip(self.BUCKETS + ('+Inf',), histogram):
+                total += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{edge}"}} {total}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram[-1]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {total}')
+
+        # one TYPE line per counter, ahead of all its series
+        typed = set()
+        for (counter, labels), value in sorted(counters.items()):
+            name = f'{self.prefix}_{counter}_total'
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            labels = ','.join(f'{label}="{_escape(text)}"' for label, text in labels)
+            lines.append(f'{name}{{{labels}}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    '''
+    Gets everything as plain values json can store, with each stage's runs, total and average seconds, and buckets
+    '''
+    def JSON(self):
+
+        with self.lock:
+            histograms = {stage: list(histogram) for stage, histogram in self.histograms.items()}
+            counters = dict(self.counters)
+
+        stages = {}
+        for stage, histogram in histograms.items():
+            runs = sum(histogram[:-1])
+            stages[stage] = {'runs': runs,
+                             'seconds': histogram[-1],
+                             'average': histogram[-1] / runs if runs else None,
+                             'buckets': dict(zip([str(edge) for edge in self.BUCKETS] + ['+Inf'], histogram[:-1]))}
+
+        return {'stages': stages,
+                'counters': [dict(labels, name=counter, value=value) for (counter, labels), value in counters.items()]}
+
+
+'''
+What WX_Metrics.Time hands back
+'''
+class _Timer:
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.timing = Timing()
+        self.start = time.perf_counter()
+        return self.timing
+
+    def __exit__(self, kind, value, traceback):
+        self.metrics.Observe(self.stage, time.perf_counter() - self.start)
+        self.metrics.Count('stage', stage=self.stage, result='error' if kind is not None else self.timing.result)
+        return False
+
+
+'''
+Answers a request for metrics on any http.server handler: /metrics as Prometheus text and /metrics.json as JSON.
+Returns False, without answering, if the path is something else
+'''
+def Send(handler, metrics, path):
+
+    if path == '/metrics':
+        body, content_type = metrics.Prometheus().encode(), 'text/plain; version=0.0.4'
+    elif path == '/metrics.json':
+        body, content_type = json.dumps(metrics.JSON()).encode(), 'application/json'
+    else:
+        return False
+
+    handler.send_response(200)
+    handler.send_header('Content-Type', content_type)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+    return True
+
+'''
+Serves metrics in the background, for kiosks that aren't running WX_Server. Returns the server
+
+Parameters:
+    host and port are where to listen
+'''
+def Serve(metrics, host='', port=9040):
+
+    import http.server      # only loaded by the kiosks that serve metrics
+
+    class Metrics_Handler(http.server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if not Send(self, metrics, self.path.split('?')[0]):
+                self.send_error(404)
+
+        # scrapes come in every few seconds
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Metrics_Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='WX_Metrics', daemon=True).start()
+
+    return server
@@ -5,29 +5,30 @@
 
 import json
 import time
-import requests
-import datetime
 #import tkinter as tk
-import re
-import threading
+import importlib.util
 import os
-
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from PIL import ImageFont
-from DisplayWX import DisplayWX
+import urllib.parse
+
+# requests, selenium and the thread pool take longer to load than everything else put together, so they're imported
+# the first time they're used. The decision logic itself is in WX_Rules, WX_Observation and WX_Metar, which load fast anywhere
+import WX_Rules
+import WX_Metar
+import WX_Taf
+from WX_Cache import WX_Cache, Tuples
+from WX_History import WX_History
+from WX_Observation import METAR_Observation, TealHQ_Observation
+from WX_Scheduler import WX_Scheduler
+from WX_Retry import Retry_Policy, Circuit_Breaker
+from WX_Metrics import WX_Metrics
+from WX_Window import Wind_Window
 
 '''
 ###########################################
 # PURPOSE: gets weather data from KSLC    #
 #          and Teal HQ, then translates   #
 #          that data to text for          #
-#          DisplayWX.py                   #
+#          WX_Display.py                  #
 # AUTHOR : Asael Horne                    #
 #          Jeff McGrath                   #
 # VERSION: November 25, 2023              #
@@ -37,15 +38,120 @@ class WX_Controller:
 
     # initialize class fields
     wait = 5
+
+    # The airports to watch. The first one is home - it's the one Teal HQ sits next to and the one the display shows.
+    # All of them come back from the FAA's API in one request
+    Stations = os.environ.get('WX_STATIONS', 'KSLC').replace(' ', '').upper().split(',')
+    METAR_URL = 'https://aviationweather.gov/api/data/metar?ids={ids}&format={format}&taf=false'
+    METAR_Format = os.environ.get('WX_METAR_FORMAT', 'raw')    # 'raw' METARs are a fraction the size of 'geojson'
+    METAR_timeout = 20          # How many seconds Pull waits on the METARs before moving on without them
+    TAF_URL = 'https://aviationweather.gov/api/data/taf?ids={ids}&format=raw'
+    TAF_timeout = 20            # How many seconds Pull waits on the TAFs before moving on without them
+    TealHQ_timeout = 30         # How many seconds Pull waits on Teal HQ before moving on without it
+
+    # Every process on the host shares one cache of observations (see WX_Cache), so kiosks and scripts running side
+    # by side only go to the websites once between them. WX_CACHE=off turns it off
+    Cache_Path = os.environ.get('WX_CACHE')
+    METAR_ttl = 25              # Seconds a cached METAR is good for, a little under the scheduler's fastest poll
+    TealHQ_ttl = 25             # Seconds a cached Teal HQ observation is good for
+    TAF_ttl = 300               # Seconds cached TAFs are good for, half the scheduler's TAF poll
+
+    # Where the Teal HQ conditions come from. 'http' reads the data behind the WeatherLink summary page directly,
+    # 'selenium' loads the page in a headless Firefox and reads the table cells
+    TealHQ_Backend = os.environ.get('WX_TEALHQ_BACKEND', 'http')
+    TealHQ_Page_URL = "https://www.weatherlink.com/embeddablePage/show/a12ef9fcb99e41efa78329699223a163/summary"
+    TealHQ_Data_URL = "https://www.weatherlink.com/embeddablePage/summaryData/a12ef9fcb99e41efa78329699223a163"
+    geckodriver_path = "/home/ahorne/Downloads/Weather/geckodriver-v0.34.0-linux64/geckodriver"
+
+    # The names WeatherLink gives each of the TealHQ_Fields in its summary data, best match first
+    TealHQ_Sensors = (("10 Min Avg Wind Speed", "Avg Wind Speed", "Wind Speed"),
+                      ("10 Min High Wind Speed", "High Wind Speed", "Wind Gust"),
+                      ("Temp", "Temperature"),
+                      ("Wind Direction",),
+                      ("Dew Point",))
+
+    # The same, while sampling. The window does the averaging then, so the wind and gust come from the shortest
+    # readings WeatherLink has rather than its own 10 minute ones, which would smooth them over twice as long
+    TealHQ_Sample_Sensors = (("Wind Speed", "1 Min Avg Wind Speed", "2 Min Avg Wind Speed", "10 Min Avg Wind Speed",
+                              "Avg Wind Speed"),
+                             ("Wind Gust", "2 Min High Wind Speed", "10 Min High Wind Speed", "High Wind Speed"),
+                             ("Temp", "Temperature"),
+                             ("Wind Direction",),
+                             ("Dew Point",))
+
+    # Where each of the TealHQ_Fields is on the summary page, for the 'selenium' backend. The first path is where the
+    # cell has always been, the second finds it by its row's label in case the layout moves around
+    TealHQ_Cells = (("/html/body/div/div/div/div[2]/div[1]/div/div[2]/table/tbody/tr[2]/td[3]",
+                     "//tr[td[1][normalize-space()='Avg Wind Speed']]/td[3]"),
+                    ("/html/body/div/div/div/div[2]/div[1]/div/div[2]/table/tbody/tr[3]/td[3]",
+                     "//tr[td[1][normalize-space()='High Wind Speed']]/td[3]"),
+                    ("/html/body/div/div/div/div[2]/div[1]/div/div[1]/table/tbody/tr[2]/td[2]",
+                     "//tr[td[1][normalize-space()='Temp']]/td[2]"),
+                    ("/html/body/div/div/div/div[2]/div[1]/div/div[1]/table/tbody/tr[16]/td[2]",
+                     "//tr[td[1][normalize-space()='Wind Direction']]/td[2]"),
+                    ("/html/body/div/div/div/div[2]/div[1]/div/div[1]/table/tbody/tr[8]/td[2]",
+                     "//tr[td[1][normalize-space()='Dew Point']]/td[2]"))
+
+    # The same, while sampling: the current wind, or else the short average and high next to the 10 minute ones
+    TealHQ_Sample_Cells = (("//tr[td[1][normalize-space()='Wind Speed']]/td[2]",
+                            "//tr[td[1][normalize-space()='Avg Wind Speed']]/td[2]",
+                            "//tr[td[1][normalize-space()='Avg Wind Speed']]/td[3]"),
+                           ("//tr[td[1][normalize-space()='High Wind Speed']]/td[2]",
+                            "//tr[td[1][normalize-space()='High Wind Speed']]/td[3]")) + TealHQ_Cells[2:]
+
+    # Runs in the page and reads every field at once. Each field gets the text of the first of its paths that finds
+    # a cell with a reading in it, or null if none do
+    TealHQ_Script = """
+        return arguments[0].map(function (paths) {
+            for (var i = 0; i < paths.length; i++) {
+                var cell = document.evaluate(paths[i], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+                if ((cell !== null) && (cell.textContent.trim() !== '') && (cell.textContent.trim() !== '--')) {
+                    return cell.textContent.trim();
+                }
+            }
+            return null;
+        });
+    """
+    TealHQ_refresh_after = 25   # Seconds the summary page is left up before it's refreshed, a little under a Teal HQ poll
+
+    # Once Start_Sampling is called Teal HQ is sampled on its own thread every TealHQ_sample_every seconds, and the
+    # wind and gust Analyze uses come from the last TealHQ_window seconds of samples (see WX_Window)
+    TealHQ_sample_every = float(os.environ.get('WX_TEALHQ_SAMPLE', 5))
+    TealHQ_window = 600         # Seconds of samples the wind and gust stats cover
     
-    KSLC_Fields = [None] * 8    # KSLC_Fields = [K_ceiling, K_visib, K_windspd, K_gustSpd, K_winddir, K_temp, K_dewp, K_metar]
-    TealHQ_Fields = [None] * 5  # TealHQ_Fields = [T_windSpeed, T_gustSpeed, T_temp, T_windDir, T_dewPoint]
+    KSLC_Fields = None          # The home station's METAR_Observation
+    TealHQ_Fields = None        # Teal HQ's TealHQ_Observation
+    TealHQ_Used = (None, None)  # Teal HQ's (wind, gust) in mph the last time home was analyzed
+    wind_window = None          # The Wind_Window of Teal HQ's recent wind, gust and direction
+    sampling = None             # A threading.Event that's set while the sampler runs, and cleared to stop it
+
+    Station_Fields = None       # The METAR_Observation for every station, by station id
+    Station_Status = None       # (status, background_color, word_colors) for every station, by station id
+    Station_TAFs = None         # (TAF_Forecast, TAF_Timeline) for every station with a TAF, by station id
+
+    history = None              # Where every cycle gets saved
+
+    metrics = None              # Timings and counts for every stage, for /metrics (see WX_Metrics)
+
+    fingerprints = None         # The Fingerprint of each source when Changed last looked, by source
+    listeners = None            # Called with ('changed', sources) or ('unchanged', ()) every time Changed looks
 
-    driver = None               # The driver for the web scraper
-    service = None              # The service for the web scraper
+    scraper = None              # The WX_Scraper running Firefox in its own process, for the 'selenium' backend
+
+    session = None              # Keeps connections to the weather sites open between requests
+    validators = None           # The last good response for each url, so we can ask the site if it has changed
+    retry = None                # How hard Make_Request tries
+    breakers = None             # A Circuit_Breaker for each site
+
+    cache = None                # The WX_Cache shared with other processes, None if it's turned off
+
+    profiler = None             # The WX_Profile sampling cycles, so the pull threads get profiled too. None when it's off
+
+    executor = None             # Runs the METAR, Teal HQ and TAF pulls at the same time
+    pending = None              # The pulls that were started, by source, so a slow one is never started twice
 
     background_color = 'grey'
-    word_colors = [None] * 4    # [ceiling, visib, wind_speed, gust_speed]
+    word_colors = None          # (ceiling, visib, wind_speed, gust_speed)
 
     status = 'Error'            # Start the status out as Error because I feel like it
 
@@ -58,89 +164,166 @@ class WX_Controller:
     ## Helper Methods ##
 
     '''
-    Makes a request to a website. If it fails, it tries again.
+    Makes a request to a website. If it fails, it tries again, backing off a little more (with jitter) each time,
+    but never past the deadline. Every site has a circuit breaker, and while it's open the request is skipped right
+    away so the last good data gets used instead of stalling the cycle. Returns None if it didn't work.
+
+    The request goes through a pooled session so the connection is reused, and if we've gotten this url before
+    the ETag/Last-Modified from that response are sent along. When the site answers 304 Not Modified there's no
+    body, so the last good response is handed back instead.
+
+    Parameters:
+        url is the website to get
+        deadline is the time.monotonic() the request has to be done by (the retry policy's budget from now is default)
     '''
-    def Make_Request(self, url):
+    def Make_Request(self, url, deadline=None):
 
-        response = None
-        tries = 5
+        if deadline is None:
+            deadline = time.monotonic() + self.retry.budget
 
-        # try to get the website
-        try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()  # Check for HTTP errors
+        # one breaker per site
+        parts = urllib.parse.urlsplit(url)
+        breaker = self.breakers.setdefault(parts.netloc + parts.path, Circuit_Breaker())
 
-        # if that fails, print an appropriate message and then try again in five seconds. Try five times
-        except:
-            if tries <= 0:
-                print("Failed to connect and query the website after 5 attempts. Giving up...")
-            else:
-                print(f"Failed to connect and query the website. {tries} attempts left.")
-                tries = tries - 1
-                time.sleep(5)
-                self.Make_Request(url)
+        # out of time already, so don't take the breaker's test request only to not send it
+        if deadline <= time.monotonic():
+            print(f"Out of time for {parts.netloc} this cycle.")
+            self.metrics.Count('requests', site=parts.netloc, result='gave_up')
+            return None
+
+        if not breaker.Allow():
+            print(f"{parts.netloc} has been failing. Using the last good data for now.")
+            self.metrics.Count('requests', site=parts.netloc, result='breaker_open')
+            return None
 
-        return response
+        # Allow only lets a request past an opened breaker when it's the one testing the site. If it ends without
+        # working or failing, the test has to be handed back or the site is shut out for good
+        testing = breaker.opened is not None
+        try:
+            return self.Send_Request(url, parts, breaker, deadline)
+        finally:
+            if testing and breaker.testing:
+                breaker.Release()
+
+    '''
+    Does the tries for Make_Request, once the breaker has let it through. Returns the response, or None
+    '''
+    def Send_Request(self, url, parts, breaker, deadline):
+
+        import requests
+
+        # ask only for changes since the last good response
+        headers = {}
+        last = self.validators.get(url)
+        if last is not None:
+            if last.headers.get('ETag'):
+                headers['If-None-Match'] = last.headers['ETag']
+            if last.headers.get('Last-Modified'):
+                headers['If-Modified-Since'] = last.headers['Last-Modified']
+
+        for attempt in range(1, self.retry.tries + 1):
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            # try to get the website
+            try:
+                response = self.session.get(url, headers=headers, timeout=min(self.retry.timeout, remaining))
+
+                # nothing has changed, so reuse what we already have
+                result = 'ok'
+                if (response.status_code == 304) and (last is not None):
+                    response = last
+                    result = 'not_modified'
+
+                response.raise_for_status()  # Check for HTTP errors
+
+                # hang on to responses we'll be able to revalidate later
+                if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+                    self.validators[url] = response
+
+                breaker.Succeeded()
+                self.metrics.Count('requests', site=parts.netloc, result=result)
+                return response
+
+            # if that fails, print an appropriate message and then back off before trying again
+            except requests.RequestException as e:
+                breaker.Failed()
+                self.metrics.Count('requests', site=parts.netloc, result='error')
+                print(f"Failed to connect and query {parts.netloc}. {self.retry.tries - attempt} attempts left. ({e})")
+
+                # a bad request isn't going to get better by asking again
+                status = e.response.status_code if e.response is not None else None
+                if (status is not None) and (400 <= status < 500) and (status != 429):
+                    break
+
+                delay = self.retry.Delay(attempt)
+                if (attempt == self.retry.tries) or breaker.Is_Open() or (time.monotonic() + delay >= deadline):
+                    break
+                time.sleep(delay)
+
+        print(f"Giving up on {parts.netloc} for this cycle.")
+        self.metrics.Count('requests', site=parts.netloc, result='gave_up')
+        return None
     
     '''
     Checks to see if it's the Ceiling is above the legal limit. If it is, returns true. 
-    If the ceiling reported is extrenuous, throws a value error. If nothing is reported, throws a type error. Tries to make sure there is no plus sign 
-    on the end of the number using regex
+    If the ceiling reported is extrenuous, throws a value error. If nothing is reported, throws a type error.
 
     Parameter:
-        c is the integer representation of the ceiling in feet
+        fields is the station's METAR_Observation to check (KSLC_Fields is default)
     '''  
-    def High_Enough_Ceiling(self):
-
-        c = self.KSLC_Fields[0]
+    def High_Enough_Ceiling(self, fields=None):
 
-        if c is None:
-            raise TypeError("Expecting an Int")
-        
-        try:
-            d = re.sub(r'[a-zA-Z-+]', '', c)
-        except:
-            d = c
+        if fields is None:
+            fields = self.KSLC_Fields
 
-        if (d < 0) or (d > 100000):
-            raise ValueError("Int 0 to 90000 expected") 
-        
         # True if we have the 500 foot clearance
-        if d != 99999:
-            if d > 499:
-                return True
-            else:
-                return False
-        else:
-            return True
+        return WX_Rules.Ceiling_Feet(fields.ceiling_ft) >= WX_Rules.CEILING_FEET[0][0]
         
     '''
     Checks to see if it's the visibility is above the legal limit. True if 3sm or more. Throws exceptions if nothing is reported or an extrenuous value is reported.
 
     Parameter:
-        v is the integer representation of the number of miles of visibility (None is default)
+        fields is the station's METAR_Observation to check (KSLC_Fields is default)
     '''
-    def Good_Visibility(self):
-        
-        v = self.KSLC_Fields[1]
-
-        if v is None:
-            raise TypeError("Expecting an string")
-        
-        try:
-            vis = int(v)
-        except:
-            temp_vis = re.sub(r'[a-zA-Z-+ ]', '', v)
-            vis = int(temp_vis)
+    def Good_Visibility(self, fields=None):
 
-        if (vis < 0) or (vis > 100):
-            raise ValueError("Int 0 to 100 expected") 
+        if fields is None:
+            fields = self.KSLC_Fields
 
         # Checks to make sure Visibility is greater than or equal to 3sm
-        if vis >= 3:
-            return True
-        else:
-            return False
+        return WX_Rules.Visibility_Miles(fields.visibility_sm) >= WX_Rules.VISIBILITY_MILES[0][0]
+
+    '''
+    Picks the worse wind and gust for a station, in knots. At home that's whichever of KSLC and Teal HQ is worse,
+    and TealWind/TealGust say which one won. A gust that isn't reported counts as no gust, and Teal HQ is left out
+    of anything it didn't report.
+    '''
+    def Worst_Wind(self, station, fields):
+
+        # Teal HQ only gets a say at home
+        if station != self.Stations[0]:
+            return WX_Rules.Worst_Wind(fields.wind_kt, fields.gust_kt)[:2]
+
+        # kept so the history and the display go by the same Teal HQ wind the status did
+        self.TealHQ_Used = self.Teal_Wind()
+        wind, gust, self.TealWind, self.TealGust = WX_Rules.Worst_Wind(fields.wind_kt, fields.gust_kt,
+                                                                       *self.TealHQ_Used)
+        return wind, gust
+
+    '''
+    Gets Teal HQ's wind and gust in mph: the average wind and the highest gust over the last TealHQ_window seconds
+    of samples, or the last observation's if there aren't any samples with them in it
+    '''
+    def Teal_Wind(self):
+
+        stats = self.wind_window.Stats(time.monotonic())
+        wind = stats.mean_wind if stats.mean_wind is not None else self.TealHQ_Fields.wind_mph
+        gust = stats.max_gust if stats.max_gust is not None else self.TealHQ_Fields.gust_mph
+
+        return wind, gust
 
     ## End of Helper Methods ##
     ###########################
@@ -153,582 +336,647 @@ class WX_Controller:
     def __init__(self):
         print("Initializing...")
 
-        options = Options()
-        options.add_argument('--headless')
-        geckodriver_path = "/home/ahorne/Downloads/Weather/geckodriver-v0.34.0-linux64/geckodriver"
-        self.service = Service(geckodriver_path)
-        self.driver = webdriver.Firefox(service=self.service, options=options)
+        # Firefox is started the first time it's needed, since another process may be keeping the cache fresh
+        if (self.TealHQ_Backend == 'selenium') and (importlib.util.find_spec('selenium') is None):
+            print("Selenium is not installed. Reading Teal HQ over plain HTTP instead.")
+            self.TealHQ_Backend = 'http'
+
+        import requests
+
+        # one session for every request, with a small pool of keep-alive connections per host
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        self.validators = {}
+        self.retry = Retry_Policy()
+        self.breakers = {}
+
+        if (self.Cache_Path or '').lower() != 'off':
+            try:
+                self.cache = WX_Cache(self.Cache_Path)
+            except Exception as e:
+                print(f"Couldn't open the shared cache. Every pull will go to the websites. ({e})")
+
+        self.KSLC_Fields = METAR_Observation(station=self.Stations[0])
+        self.TealHQ_Fields = TealHQ_Observation()
+        self.wind_window = Wind_Window(self.TealHQ_window, self.Window_Capacity())
+        self.word_colors = (None,) * 4
+        self.Station_Fields = {}
+        self.Station_Status = {}
+        self.Station_TAFs = {}
+        self.history = WX_History()
+        self.fingerprints = {}
+        self.listeners = []
+
+        self.metrics = WX_Metrics()
+        self.Add_Listener(lambda event, sources: self.metrics.Count('cycles', result=event))
+
+        from concurrent.futures import ThreadPoolExecutor
+        self.executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='WX_Pull')
+        self.pending = {}
         print("Ready")
 
     '''
-    Closes the driver.
+    Stops the scraper.
     '''
     def __del__(self):
-        if self.driver != None:
-            self.driver.quit()
+        if self.sampling != None:
+            self.sampling.clear()
+
+        if self.executor != None:
+            self.executor.shutdown(wait=False)
+
+        if self.session != None:
+            self.session.close()
+
+        if self.scraper != None:
+            self.scraper.Stop()
+
+    '''
+    Makes requests to weather and parses the data. The METARs, Teal HQ and the TAFs are pulled at the same time, and
+    each one gets its own timeout so a slow source doesn't hold back the others' fields.
+
+    Parameter:
+        only are the sources to pull, any of 'METAR', 'Teal HQ' and 'TAF' (all of them is default)
+    '''
+    def Pull(self, only=('METAR', 'Teal HQ', 'TAF')):
+
+        with self.metrics.Time('pull'):
+            self.Pull_Sources(only)
 
     '''
-    Makes requests to weather and parses the data
+    Does the work for Pull
     '''
-    def Pull(self):
+    def Pull_Sources(self, only):
+
+        from concurrent.futures import TimeoutError as FutureTimeout
+
+        # the sampler keeps Teal HQ up to date on its own
+        if self.Is_Sampling():
+            only = tuple(source for source in only if source != 'Teal HQ')
+
+        start = time.monotonic()
+        sources = [source for source in (('METAR', self.Pull_Stations, self.METAR_timeout),
+                                         ('Teal HQ', self.Pull_TealHQ, self.TealHQ_timeout),
+                                         ('TAF', self.Pull_TAFs, self.TAF_timeout)) if source[0] in only]
+
+        # start the pulls, unless a source is still stuck on the last cycle
+        for name, pull, timeout in sources:
+            if (name in self.pending) and not self.pending[name].done():
+                print(f"{name} is still updating from the last cycle.")
+            else:
+                if self.profiler is not None:
+                    pull = self.profiler.Wrap(pull)
+                self.pending[name] = self.executor.submit(pull, start + timeout)
+
+        # wait on each pull until its timeout runs out, counting from when the cycle started
+        for name, pull, timeout in sources:
+            try:
+                self.pending[name].result(timeout=max(0, start + timeout - time.monotonic()))
+            except FutureTimeout:
+                print(f"{name} took longer than {timeout} seconds. Keeping its last fields.")
+            except Exception as e:
+                print(f"{name} failed to update: {e}")
+
+    '''
+    Gets the conditions from every station in one request. KSLC_Fields is kept pointing at the home station's fields
+
+    Parameter:
+        deadline is the time.monotonic() to be done by, retries included (see Make_Request)
+    '''
+    def Pull_Stations(self, deadline=None):
          
-        #-------------------------------------------------------------#
-        #-- Get the conditions from Salt Lake International Airport --#
-        #-------------------------------------------------------------#
+        #-------------------------------------------------------#
+        #-- Get the conditions from all the watched airports --#
+        #-------------------------------------------------------#
+
+        # check the shared cache first, and only go to the FAA if it's stale
+        ids = ','.join(self.Stations)
+        if self.cache is not None:
+            observations = self.cache.Get_Or_Refresh('METAR:' + ids, self.METAR_ttl,
+                                                     lambda: self.Fetch_METARs(ids, deadline), deadline)
+        else:
+            observations = self.Fetch_METARs(ids, deadline)
+
+        # if nothing came back, keep the fields we have. Cached observations come back as lists
+        if observations is None:
+            return
+        observations = [METAR_Observation._make(Tuples(fields)) for fields in observations]
 
-        # get the response from the FAA's API
-        response = self.Make_Request('https://aviationweather.gov/api/data/metar?ids=KSLC&format=geojson&taf=false')
+        # set the fields from the retrieved data. They're gathered up first and swapped in at the end so
+        # Analyze never sees a half updated set of stations
+        station_fields = dict(self.Station_Fields)
+        seen = set()
+        for fields in observations:
+
+            # the newest observation comes first, only keep that one
+            if (fields.station is None) or (fields.station in seen):
+                continue
+            seen.add(fields.station)
+
+            station_fields[fields.station] = fields
+
+        self.Station_Fields = station_fields
+        if self.Stations[0] in station_fields:
+            self.KSLC_Fields = station_fields[self.Stations[0]]
+
+    '''
+    Gets the METARs for the stations from the FAA's API. Returns a list of METAR_Observations, or None if the
+    request didn't work
+
+    Parameters:
+        ids are the stations, separated by commas
+        deadline is the time.monotonic() to be done by, retries included (see Make_Request)
+    '''
+    def Fetch_METARs(self, ids, deadline=None):
+
+        with self.metrics.Time('metar_fetch') as timing:
+            response = self.Make_Request(self.METAR_URL.format(ids=ids, format=self.METAR_Format), deadline)
+            if response is None:
+                timing.result = 'error'
+                return None
+
+        with self.metrics.Time('metar_parse'):
+            if self.METAR_Format == 'raw':
+                return WX_Metar.Parse_Many(response.content.decode())
+            else:
+                data = json.loads(response.content.decode())
+                return [METAR_Observation.From_GeoJSON(feature['properties']) for feature in data['features']]
+
+    '''
+    Gets the TAFs for every station. A TAF is only read and turned into a TAF_Timeline when it's new, so the same
+    timeline answers Forecast until the TAF is amended or replaced
 
-        # if the response is empty, set all the KSLC fields to zeros; otherwise, get the data from the website
-        if (response is None):
-            return(0, 0, "0", 0.0, 0, 0.0, 0.0, 0.0)
+    Parameter:
+        deadline is the time.monotonic() to be done by, retries included (see Make_Request)
+    '''
+    def Pull_TAFs(self, deadline=None):
+
+        # the TAFs are shared as their raw text, which is small, and only read here if they're new
+        ids = ','.join(self.Stations)
+        if self.cache is not None:
+            text = self.cache.Get_Or_Refresh('TAF:' + ids, self.TAF_ttl, lambda: self.Fetch_TAFs(ids, deadline), deadline)
         else:
-            data = json.loads(response.content.decode())
-
-        # set the fields from the retrieved data
-        for feature in data['features']:
-            
-            # loop through the desired properties
-            for key, value in feature['properties'].items():
-                # ceiling
-                if key == 'ceil':
-                    try:
-                        self.KSLC_Fields[0] = value * 100
-                    except KeyError as e:
-                        self.KSLC_Fields[0] = 99999
-                    except Exception as e:
-                        self.KSLC_Fields[0] = -99999
-                        print('Ceiling is not being reported.')
-
-                # visibility
-                elif key == 'visib':
-                    self.KSLC_Fields[1] = value
-
-                # wind speed        
-                elif key == 'wspd':
-                    self.KSLC_Fields[2] = value    
-
-                # gust speed
-                elif key == 'wgst':
-                    self.KSLC_Fields[3] = value 
-                    
-                # wind direction (coming from this angle)    
-                elif key == 'wdir':    
-                    self.KSLC_Fields[4] = value
-
-                # temperature
-                elif key == 'temp':    
-                    self.KSLC_Fields[5] = value
-
-                # dew point
-                elif key == 'dewp':    
-                    self.KSLC_Fields[6] = value
-
-                # raw metar
-                elif key == "rawOb":
-                    self.KSLC_Fields[7] = value
-
-        # it doesn't look like gust speed is reported anymore...
-        if self.KSLC_Fields[3] is None:
-            self.KSLC_Fields[3] = 'Not Reported'
+            text = self.Fetch_TAFs(ids, deadline)
+
+        if text is None:
+            return
+
+        # swapped in at the end, like the METARs
+        known = {forecast.raw: (forecast, timeline) for forecast, timeline in self.Station_TAFs.values()}
+        station_tafs = dict(self.Station_TAFs)
+        seen = set()
+        for raw in WX_Taf.Split(text):
+
+            taf = known.get(raw)
+            if taf is None:
+                with self.metrics.Time('taf_parse'):
+                    forecast = WX_Taf.Parse_TAF(raw)
+                    taf = (forecast, WX_Taf.Build_Timeline(forecast))
+
+            # the newest TAF comes first, only keep that one
+            station = taf[0].station
+            if (station is None) or (station in seen):
+                continue
+            seen.add(station)
+
+            station_tafs[station] = taf
+
+        self.Station_TAFs = station_tafs
+
+    '''
+    Gets the TAFs for the stations from the FAA's API, as raw text. Returns None if the request didn't work
+
+    Parameters:
+        ids are the stations, separated by commas
+        deadline is the time.monotonic() to be done by, retries included (see Make_Request)
+    '''
+    def Fetch_TAFs(self, ids, deadline=None):
+
+        with self.metrics.Time('taf_fetch') as timing:
+            response = self.Make_Request(self.TAF_URL.format(ids=ids), deadline)
+            if response is None:
+                timing.result = 'error'
+                return None
+
+        return response.content.decode()
+
+    '''
+    Gets the conditions from Teal HQ using whichever backend is configured. Both backends give back the fields
+    as the text shown on the summary page, e.g. '5 mph', which is read into a TealHQ_Observation. The fields are
+    shared with other processes through the cache, the same as the METARs
+
+    Parameter:
+        deadline is the time.monotonic() to be done by, retries included (see Make_Request)
+    '''
+    def Pull_TealHQ(self, deadline=None):
 
         #-------------------------------------#
         #-- Get the conditions from Teal HQ --#
         #-------------------------------------#
 
-        waitTime = WebDriverWait(self.driver, self.wait)
+        if self.TealHQ_Backend == 'selenium':
+            scrape = lambda: self.Scrape_TealHQ_Selenium(deadline)
+        else:
+            scrape = lambda: self.Scrape_TealHQ_HTTP(deadline)
 
-        self.driver.get("https://www.weatherlink.com/embeddablePage/show/a12ef9fcb99e41efa78329699223a163/summary")
-        
-        try:
-            # wind speed
-            avgWind_10min = waitTime.until(EC.presence_of_element_located((By.XPATH,"/html/body/div/div/div/div[2]/div[1]/div/div[2]/table/tbody/tr[2]/td[3]")))
-            self.TealHQ_Fields[0] = avgWind_10min.text
-            
-            # gust speed
-            avgGust_10min = waitTime.until(EC.presence_of_element_located((By.XPATH,"/html/body/div/div/div/div[2]/div[1]/div/div[2]/table/tbody/tr[3]/td[3]")))
-            self.TealHQ_Fields[1] = avgGust_10min.text
-            
-            # temperature
-            tempElement = waitTime.until(EC.presence_of_element_located((By.XPATH,"/html/body/div/div/div/div[2]/div[1]/div/div[1]/table/tbody/tr[2]/td[2]")))
-            self.TealHQ_Fields[2] = tempElement.text
-            
-            # wind direction
-            windDirectionElement = waitTime.until(EC.presence_of_element_located((By.XPATH,"/html/body/div/div/div/div[2]/div[1]/div/div[1]/table/tbody/tr[16]/td[2]")))
-            self.TealHQ_Fields[3] = windDirectionElement.text
-            
-            # dew point
-            dewpointElement = waitTime.until(EC.presence_of_element_located((By.XPATH,"/html/body/div/div/div/div[2]/div[1]/div/div[1]/table/tbody/tr[8]/td[2]")))
-            self.TealHQ_Fields[4] = dewpointElement.text
-            
-        except:
-            self.TealHQ_Fields = "0","0","0","0","UPDATE ERROR"
-
-
-    '''
-    Takes text and determines status/conditions
-    '''
-    def Analyze(self):
-
-        # whatever weather is worse sets the status - pick the worse weather and then get the status info using that weather data
         try:
-            if (self.KSLC_Fields[2] >= float(self.TealHQ_Fields[0].replace(' mph', ''))):
-                wind = self.KSLC_Fields[2]
-                self.TealWind = False
-            elif (self.KSLC_Fields[2] < float(self.TealHQ_Fields[0].replace(' mph', ''))):
-                wind = float(self.TealHQ_Fields[0].replace(' mph', '')) / 1.151     # converting mph to knots
-                self.TealWind = True
-
-            if (self.KSLC_Fields[3] >= float(self.TealHQ_Fields[1].replace(' mph', ''))):
-                gust = self.KSLC_Fields[3]
-                self.TealGust = False
-            elif (self.KSLC_Fields[3] < float(self.TealHQ_Fields[1].replace(' mph', ''))):
-                gust = float(self.TealHQ_Fields[1].replace(' mph', ''))  / 1.151    # converting mph to knots
-                self.TealGust = True
-        except:
-            wind = 99999
-            gust = 99999
-
-        # you can fly freely if the conditions are HIGH Ceiling, HIGH Visibility, LOW Wind Speed, LOW Gust Speed
-        if self.High_Enough_Ceiling() and self.Good_Visibility() and (self.KSLC_Fields[0] > 899) and (wind < 9.6) and (gust < 15.6):
-            self.background_color = 'green'
-            self.status = "Good to Fly \u2191"
-
-        ## HIGH ceilings
-        elif self.High_Enough_Ceiling() and (self.KSLC_Fields[0] > 899): 
-
-            ## HIGH Visibility 
-            if self.Good_Visibility():
-
-                # be careful if the conditions are HIGH Ceiling, HIGH Visibility, LOW Wind Speed, MEDIUM Gust Speed
-                if  (wind < 9.6) and (gust >= 15.6) and (gust < 21.7):
-                    self.background_color = 'yellow'
-                    self.status = "Okay to Fly with Restrictions \u2194"
-                    self.word_colors[3] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, HIGH Visibility, LOW Wind Speed, HIGH Gust Speed
-                elif (wind < 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # be careful if the conditions are HIGH Ceiling, HIGH Visibility, MEDIUM Wind Speed, LOW Gust Speed
-                elif (wind >= 9.6) and (wind < 15.6) and (gust < 15.6):
-                    self.background_color = 'yellow'
-                    self.status = "Okay to Fly with Restrictions \u2194"
-                    self.word_colors[2] = "orange"
-
-                # be careful if the conditions are HIGH Ceiling, HIGH Visibility, MEDIUM Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 9.6) and (wind < 15.6) and (gust >= 15.6) and (gust < 21.7):
-                    self.background_color = 'yellow'
-                    self.status = "Okay to Fly with Restrictions \u2194"
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, HIGH Visibility, MEDIUM Wind Speed, HIGH Gust Speed
-                elif (wind >= 9.6) and (wind < 15.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'pink'
-
-                # don't fly if the conditions are HIGH Ceiling, HIGH Visibility, HIGH Wind Speed, LOW Gust Speed
-                elif (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[2] = 'pink'
-
-                # don't fly if the conditions are HIGH Ceiling, HIGH Visibility, HIGH Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 15.6) and (gust >= 15.6) and (gust < 21.7):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, HIGH Visibility, HIGH Wind Speed, HIGH Gust Speed
-                elif (wind >= 15.6) and (gust > 21.7):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'pink'
-
-            ## LOW Visibility
-            else:
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, HIGH Wind Speed, HIGH Gust Speed
-                if (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, HIGH Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 15.6) and (gust >= 15.6) and (gust < 21.7):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, HIGH Wind Speed, LOW Gust Speed
-                elif (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'pink'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, MEDIUM Wind Speed, HIGH Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'pink'
-                    self.word_colors[2] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, MEDIUM Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.word_colors[2] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, MEDIUM Wind Speed, LOW Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, LOW Wind Speed, HIGH Gust Speed
-                elif (wind < 9.6) and (gust > 21.7):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'pink'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, LOW Wind Speed, MEDIUM Gust Speed
-                elif (wind < 9.6) and (gust <= 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'orange'
-
-                # don't fly if the conditions are HIGH Ceiling, LOW Visibility, LOW Wind Speed, LOW Gust Speed
-                elif (wind < 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.status = "Do Not Fly \u2193"
-                    self.word_colors[1] = 'pink'
-
-        ## MEDIUM Ceilings
-        elif self.High_Enough_Ceiling() and (self.KSLC_Fields[0] < 899) and (self.KSLC_Fields[0] > 500):
-
-            ## HIGH Visibility
-            if self.Good_Visibility():
-
-                # don't fly if the conditions are MEDIUM Ceiling, HIGH Visibility, HIGH Wind Speed, HIGH Gust Speed
-                if (wind >= 15.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, HIGH Visibility, HIGH Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 15.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3]= 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, HIGH Visibility, HIGH Wind Speed, LOW Gust Speed
-                elif (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[2] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, HIGH Visibility, MEDIUM Wind Speed, HIGH Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # be careful if the conditions are MEDIUM Ceiling, HIGH Visibility, MEDIUM Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'yellow'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Okay To Fly With Restrictions \u2194"
-
-                # be careful if the conditions are MEDIUM Ceiling, HIGH Visibility, MEDIUM Wind Speed, LOW Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'yellow'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'orange'
-                    self.status = "Okay To Fly With Restrictions \u2194"
-
-                # don't fly if the conditions are MEDIUM Ceiling, HIGH Visibility, LOW Wind Speed, HIGH Gust Speed
-                elif (wind < 9.6) and (gust > 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # be careful if the conditions are MEDIUM Ceiling, HIGH Visibility, LOW Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'yellow'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Okay To Fly With Restrictions \u2194"
-
-                # be careful if the conditions are MEDIUM Ceiling, HIGH Visibility, LOW Wind Speed, LOW Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'yellow'
-                    self.word_colors[0] = 'orange'
-                    self.status = "Okay To Fly With Restrictions \u2194"
-
-            ## LOW Visibility
+            if self.cache is not None:
+                # sampled readings aren't the same fields as the 10 minute ones, so they're shared under their own key
+                key = 'Teal HQ:' + self.TealHQ_Data_URL + (':sampled' if self.Is_Sampling() else '')
+                fields = self.cache.Get_Or_Refresh(key, self.TealHQ_ttl, scrape, deadline)
             else:
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, HIGH Wind Speed, HIGH Gust Speed
-                if (wind >= 15.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3]= 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, HIGH Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 15.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, HIGH Wind Speed, LOW Gust Speed
-                elif (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, MEDIUM Wind Speed, HIGH Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, MEDIUM Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, MEDIUM Wind Speed, LOW Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, LOW Wind Speed, HIGH Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, LOW Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are MEDIUM Ceiling, LOW Visibility, LOW Wind Speed, low Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-        ## LOW Ceiling
-        elif not self.High_Enough_Ceiling():
-
-            ## HIGH Visibility
-            if self.Good_Visibility():
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, HIGH Wind Speed, HIGH Gust Speed
-                if (wind >= 15.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, HIGH Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 15.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, HIGH Wind Speed, LOW Gust Speed
-                elif (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, MEDIUM Wind Speed, HIGH Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, MEDIUM Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, MEDIUM Wind Speed, LOW Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, LOW Wind Speed, MEDIUM Gust Speed
-                elif (wind < 9.6) and (wind >= 15.6) and(gust < 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, HIGH Visibility, LOW Wind Speed, LOW Gust Speed
-                elif (wind < 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-            ## LOW Visibility
-            else:
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, HIGH Wind Speed, HIGH Gust Speed
-                if (wind >= 15.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'pink'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, HIGH Wind Speed, MEDIUM Gust Speed
-                elif (wind >= 15.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, HIGH Wind Speed, LOW Gust Speed
-                elif (wind >= 15.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'pink'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, MEDIUM Wind Speed, HIGH Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust >= 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.word_colors[3] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, MEDIUM Wind Speed, MEDIUM Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 21.7) and (gust >= 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[3]= 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, MEDIUM Wind Speed, LOW Gust Speed
-                elif (wind < 15.6) and (wind >= 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0]= 'pink'
-                    self.word_colors[2] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, LOW Wind Speed, MEDIUM Gust Speed
-                elif (wind < 9.6) and (gust >= 15.6) and(gust < 21.7):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[3] = 'orange'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-                # don't fly if the conditions are LOW Ceiling, LOW Visibility, LOW Wind Speed, LOW Gust Speed
-                elif (wind < 9.6) and (gust < 15.6):
-                    self.background_color = 'red'
-                    self.word_colors[0] = 'pink'
-                    self.word_colors[1] = 'pink'
-                    self.status = "Do Not Fly \u2193"
-
-
-    '''
-    Used by DisplayWX to get the text from this class
+                fields = scrape()
+
+            # the cache gives up with nothing if another process is still refreshing and there's no older value
+            if fields is None:
+                raise TimeoutError("another process is still refreshing Teal HQ")
+        # keep the last good observation rather than blanking the display
+        except Exception as e:
+            print(f"Failed to update Teal HQ. Keeping the last good observation. ({e})")
+            return
+
+        self.TealHQ_Fields = TealHQ_Observation.From_Text(fields)
+        self.wind_window.Add(time.monotonic(), self.TealHQ_Fields.wind_mph, self.TealHQ_Fields.gust_mph,
+                             self.TealHQ_Fields.wind_dir_deg)
+
+    '''
+    How many samples wind_window holds: a whole window's worth at the sampling rate, with some room to spare
+    '''
+    def Window_Capacity(self):
+        return int(self.TealHQ_window / max(self.TealHQ_sample_every, 1)) + 16
+
+    '''
+    Starts sampling Teal HQ every TealHQ_sample_every seconds on its own thread. Pull leaves Teal HQ to it from then
+    on, and the scheduler's Teal HQ polls just pick up whatever the samples changed. The cached observation is only
+    kept half as long as the samples are apart, so every sample is a new reading
+    '''
+    def Start_Sampling(self):
+
+        import threading
+
+        if (self.TealHQ_sample_every <= 0) or self.Is_Sampling():
+            return
+
+        self.TealHQ_ttl = min(self.TealHQ_ttl, self.TealHQ_sample_every / 2)
+        self.sampling = threading.Event()
+        self.sampling.set()
+        threading.Thread(target=self.Sample_TealHQ, name='WX_Sample', daemon=True).start()
+        print(f"Sampling Teal HQ every {self.TealHQ_sample_every:g} seconds")
+
+    '''
+    True while the sampler is running
+    '''
+    def Is_Sampling(self):
+        return (self.sampling is not None) and self.sampling.is_set()
+
+    '''
+    What the sampler thread runs. A sample that takes longer than TealHQ_sample_every pushes the next one back,
+    rather than piling them up
+    '''
+    def Sample_TealHQ(self):
+
+        while self.Is_Sampling():
+            start = time.monotonic()
+            with self.metrics.Time('tealhq_sample'):
+                self.Pull_TealHQ(start + self.TealHQ_timeout)
+            time.sleep(max(0, start + self.TealHQ_sample_every - time.monotonic()))
+
+    '''
+    Reads the Teal HQ fields from the JSON the WeatherLink summary page is built from. Every reading in it has a
+    sensorDataName, a convertedValue and a unitLabel, so the fields are looked up by name wherever they show up.
+    '''
+    def Scrape_TealHQ_HTTP(self, deadline=None):
+
+        with self.metrics.Time('tealhq_fetch'):
+            response = self.Make_Request(self.TealHQ_Data_URL, deadline)
+            if response is None:
+                raise ConnectionError("No response from WeatherLink")
+
+        with self.metrics.Time('tealhq_parse'):
+            # gather every reading on the page by name
+            readings = {}
+            stack = [json.loads(response.content.decode())]
+            while stack:
+                item = stack.pop()
+                if isinstance(item, dict):
+                    if ('sensorDataName' in item) and (item.get('convertedValue') is not None):
+                        value = str(item['convertedValue'])
+                        if item.get('unitLabel'):
+                            value = value + ' ' + item['unitLabel']
+                        readings.setdefault(item['sensorDataName'], value)
+                    stack.extend(item.values())
+                elif isinstance(item, list):
+                    stack.extend(item)
+
+            fields = [None] * 5
+            for i, names in enumerate(self.TealHQ_Sample_Sensors if self.Is_Sampling() else self.TealHQ_Sensors):
+                for name in names:
+                    if name in readings:
+                        fields[i] = readings[name]
+                        break
+                else:
+                    raise KeyError(f"WeatherLink didn't report {names[0]}")
+
+        return fields
+
+    '''
+    Reads the Teal HQ fields out of the summary page's tables with a headless Firefox. Firefox runs in its own
+    process (see WX_Scraper), which is killed and replaced if it hangs past the deadline or grows too big.
+
+    Parameter:
+        deadline is the time.monotonic() to be done by (WX_Scraper's timeout from now is default)
+    '''
+    def Scrape_TealHQ_Selenium(self, deadline=None):
+
+        from WX_Scraper import WX_Scraper
+
+        if self.scraper is None:
+            self.scraper = WX_Scraper(self.geckodriver_path)
+
+        with self.metrics.Time('tealhq_scrape'):
+            return self.scraper.Scrape({'url': self.TealHQ_Page_URL,
+                                        'cells': self.TealHQ_Sample_Cells if self.Is_Sampling() else self.TealHQ_Cells,
+                                        'script': self.TealHQ_Script,
+                                        'wait': self.wait,
+                                        'refresh_after': self.TealHQ_refresh_after},
+                                       deadline - time.monotonic() if deadline is not None else None)
+
+
+    '''
+    Takes text and determines status/conditions for a station. With no station given, every station is analyzed,
+    home last so status, background_color and word_colors end up describing home.
+    Each station's result is also kept in Station_Status.
+
+    Each condition is put in its band once and the answer is looked up in WX_Rules.RULES.
+    '''
+    def Analyze(self, station=None):
+
+        if station is None:
+            for other in self.Stations[1:]:
+                self.Analyze(other)
+            station = self.Stations[0]
+
+        fields = self.Station_Fields.get(station)
+
+        with self.metrics.Time('analyze') as timing:
+            # whatever weather is worse sets the status - pick the worse weather and then get the status info using that weather data
+            try:
+                wind, gust = self.Worst_Wind(station, fields)
+            except:
+                wind = 99999
+                gust = 99999
+
+            try:
+                if fields is None:
+                    raise TypeError("nothing has come in yet")
+
+                self.status, self.background_color, self.word_colors = WX_Rules.Evaluate(fields.ceiling_ft, fields.visibility_sm, wind, gust)
+
+            # nothing has come in for this station yet, or it's reporting something we can't read
+            except (TypeError, ValueError) as e:
+                print(f"Can't analyze {station}: {e}")
+                timing.result = 'error'
+                self.status = 'Error'
+                self.background_color = 'grey'
+                self.word_colors = (None,) * 4
+
+        self.Station_Status[station] = (self.status, self.background_color, self.word_colors)
+
+
+    '''
+    Runs one cycle: pulls the sources, tells the scheduler when home's METAR was observed, and if an observation
+    changed, analyzes and records the stations it affects. Returns the sources that changed, so the caller knows
+    whether there's anything new to draw or publish
+
+    Parameters:
+        sources are the sources to pull (see Pull)
+        scheduler is the WX_Scheduler to tell about the poll (none is default)
+    '''
+    def Cycle(self, sources, scheduler=None):
+
+        self.Pull(sources)
+        changed = self.Changed()
+        if scheduler is not None:
+            scheduler.Polled(sources, observed=self.KSLC_Fields.obs_time)
+
+        # nothing new came in, so everything after this would come out the same
+        if not changed:
+            return changed
+
+        # a new TAF only changes the forecast, which no station's status comes from
+        if 'METAR' not in changed and 'Teal HQ' not in changed:
+            return changed
+
+        # Teal HQ only matters at home
+        stations = self.Stations if 'METAR' in changed else self.Stations[:1]
+        self.Analyze(None if 'METAR' in changed else self.Stations[0])
+        self.Record_History(stations)
+
+        return changed
+
+    '''
+    Gets a fingerprint of each source's observations, by source. Observations are read-only tuples, so they're
+    their own fingerprint - comparing them is exact, where a hash could collide, and about as cheap. Teal HQ's
+    includes the wind and gust Analyze uses, which move as samples come into and age out of the window, and a TAF's
+    is its raw text
+    '''
+    def Fingerprint(self):
+        return {'METAR': tuple(self.Station_Fields.get(station) for station in self.Stations),
+                'Teal HQ': (self.TealHQ_Fields, self.Teal_Wind()),
+                'TAF': tuple(self.Station_TAFs[station][0].raw if station in self.Station_TAFs else None
+                             for station in self.Stations)}
+
+    '''
+    Finds the sources whose observations changed since the last time this was called, and tells the listeners:
+    'changed' with those sources, or 'unchanged' if there aren't any. Returns the sources that changed, so the
+    stages after Pull can be skipped when nothing did
+    '''
+    def Changed(self):
+
+        fingerprints = self.Fingerprint()
+        changed = tuple(source for source, fingerprint in fingerprints.items()
+                        if self.fingerprints.get(source) != fingerprint)
+        self.fingerprints = fingerprints
+
+        for listener in self.listeners:
+            try:
+                listener('changed' if changed else 'unchanged', changed)
+            except Exception as e:
+                print(f"A change listener failed: {e}")
+
+        return changed
+
+    '''
+    Gets the forecast status for a station at a time from its TAF. Returns (status, background_color, word_colors),
+    or None if there's no TAF for then
+
+    Parameters:
+        when is the time, in seconds since the epoch (now is default)
+        station is the station (home is default)
+    '''
+    def Forecast(self, when=None, station=None):
+
+        taf = self.Station_TAFs.get(station or self.Stations[0])
+        if taf is None:
+            return None
+
+        return taf[1].At(when if when is not None else time.time())
+
+    '''
+    Adds a listener for Changed. It's called with the event, 'changed' or 'unchanged', and the sources that changed
+    '''
+    def Add_Listener(self, listener):
+        self.listeners.append(listener)
+
+    '''
+    Saves the stations' observations and statuses from this cycle to the history
+
+    Parameter:
+        stations are the stations to save, the ones that were just analyzed (every station is default)
+    '''
+    def Record_History(self, stations=None):
+
+        now = time.time()
+        with self.metrics.Time('record_history'):
+            for station in (stations or self.Stations):
+
+                fields = self.Station_Fields.get(station)
+                if fields is None:
+                    continue
+
+                values = {'ceiling': fields.ceiling_ft,
+                          'visibility': fields.visibility_sm,
+                          'wind': fields.wind_kt,
+                          'gust': fields.gust_kt,
+                          'wind_dir': fields.wind_dir_deg,
+                          'temp': fields.temp_c,
+                          'dewp': fields.dewp_c}
+
+                # Teal HQ goes with home, as the wind and gust the status was decided from
+                if station == self.Stations[0]:
+                    values['teal_wind'], values['teal_gust'] = self.TealHQ_Used
+
+                self.history.Append(station, now, values, self.Station_Status[station])
+
+    '''
+    Gets everything the display needs as plain values json can store: every station's observation and status,
+    Teal HQ's observation, which source's wind and gust won at home, and home's text as Give_To_Display has it
+    '''
+    def Snapshot(self):
+
+        stations = {}
+        for station in self.Stations:
+            fields = self.Station_Fields.get(station)
+            taf = self.Station_TAFs.get(station)
+            status, background_color, word_colors = self.Station_Status.get(station, ('Error', 'grey', (None,) * 4))
+
+            stations[station] = {'status': status,
+                                 'background_color': background_color,
+                                 'word_colors': list(word_colors),
+                                 'fields': fields._asdict() if fields is not None else None,
+                                 'forecast': taf[1].JSON() if taf is not None else None}
+
+        return {'home': self.Stations[0],
+                'stations': stations,
+                'teal_hq': self.TealHQ_Fields._asdict(),
+                'teal_window': self.wind_window.Stats(time.monotonic())._asdict(),
+                'teal_wind': self.TealWind,
+                'teal_gust': self.TealGust,
+                'display': self.Give_To_Display()}
+
+    '''
+    Used by WX_Render to get the text from this class. Returns home's status and colors, and the text for each of its
+    fields, which WX_Render draws into a frame
     '''
     def Give_To_Display(self):
-        print("I do nothing right now2")
+
+        fields = self.KSLC_Fields
+
+        def number(value, unit):
+            return f"{value:.0f} {unit}" if value is not None else "--"
+
+        try:
+            wind, gust = WX_Rules.Worst_Wind(fields.wind_kt, fields.gust_kt, *self.TealHQ_Used)[:2]
+        except TypeError:
+            wind = gust = None
+
+        if fields.ceiling_ft == WX_Rules.UNLIMITED_CEILING:
+            ceiling = "Ceiling: Unlimited"
+        else:
+            ceiling = "Ceiling: " + number(fields.ceiling_ft, "ft")
+
+        return {'status': self.status,
+                'background_color': self.background_color,
+                'word_colors': self.word_colors,
+                'ceiling': ceiling,
+                'visibility': "Visibility: " + (f"{fields.visibility_sm:g} sm" if fields.visibility_sm is not None else "--"),
+                'wind': "Wind: " + number(wind, "kt") + (" (Teal HQ)" if self.TealWind else ""),
+                'gust': "Gust: " + number(gust, "kt") + (" (Teal HQ)" if self.TealGust else ""),
+                'metar': fields.raw}
 
 '''
 Starts the program, handles timing
 '''
 if __name__ == "__main__":
-    
-    # inititalize the controller and view
-    G = WX_Controller()
-    D = DisplayWX()
-
-    while (True):
-        # pull the data
-        G.Pull()
 
-        # analyze the data
-        G.Analyze()
+    from WX_Display import WX_Display
+    from WX_Render import WX_Render
+    from WX_Profile import WX_Profile
+    from WX_Snapshot import WX_Snapshot
+
+    # inititalize the view, and put the last status from before the restart up right away, marked as out of date,
+    # before the controller is even started
+    R = WX_Render()
+    D = WX_Display(R.size)
+    W = WX_Snapshot()
+    last = W.Load()
+    if (last is not None) and (last['payload'] is not None):
+        D.Show(R.Render_Stale(last['payload'], last['frame'], last['saved']))
+
+    # inititalize the controller
+    G = WX_Controller()
+    S = WX_Scheduler()
+    P = WX_Profile()
+    if P.every:
+        G.profiler = P
 
-        # send the data to the display 
-        G.Give_To_Display()
+    # keep Teal HQ's wind and gust current between the scheduler's polls
+    G.Start_Sampling()
 
-        # display the weather and if it's ok to fly
-        D.Display_Stuff()
+    # kiosks not behind WX_Server can serve their own metrics
+    if os.environ.get('WX_METRICS_PORT'):
+        from WX_Metrics import Serve
+        Serve(G.metrics, port=int(os.environ['WX_METRICS_PORT']))
 
-        # wait for three minutes, then repeat
-        time.sleep(180)
+    while (True):
+        # wait until the next source is due
+        sources, when = S.Next()
+        D.Wait(max(0, when - time.time()))
+
+        # profile this cycle, if profiling is on and it's time
+        with P.Cycle():
+            # pull, analyze and save whatever came in
+            if not G.Cycle(sources, S):
+                continue
+
+            # draw the data, which is mostly the same frame cycle after cycle
+            with G.metrics.Time('render'):
+                payload = G.Give_To_Display()
+                frame, dirty = R.Render(payload)
+
+            # keep it for the next restart. The frame is only written when it changed
+            with G.metrics.Time('save_snapshot') as timing:
+                try:
+                    W.Save(G.Snapshot(), payload, frame if dirty else None)
+                except Exception as e:
+                    print(f"Couldn't save the snapshot: {e}")
+                    timing.result = 'error'
+
+            # display the weather and if it's ok to fly, copying over only the boxes that changed
+            if dirty:
+                with G.metrics.Time('display'):
+                    D.Show(frame, dirty)
     
\ No newline at end of file
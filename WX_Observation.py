@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import re
+from typing import NamedTuple, Optional
+
+import WX_Rules
+
+'''
+###########################################
+# PURPOSE: one small, read-only record    #
+#          per observation from each      #
+#          source, with the numbers       #
+#          already turned into numbers    #
+###########################################
+'''
+
+_number = re.compile(r'-?\d+(?:\.\d+)?')
+
+# the 16 points WeatherLink shows the wind direction as, clockwise from north
+_compass = ('N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
+
+
+'''
+Turns a reported value into a float, or None if it isn't a number. Text like '5 mph' keeps just the number.
+'''
+def To_Number(value):
+
+    if value is None:
+        return None
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    match = _number.search(str(value))
+    return float(match.group(0)) if match is not None else None
+
+
+'''
+Turns a wind direction into degrees, or None if it can't be read. It can be a compass point like 'NW' or a number
+like '315\u00b0'.
+'''
+def Compass_Degrees(value):
+
+    if isinstance(value, str) and (value.strip().upper() in _compass):
+        return _compass.index(value.strip().upper()) * 22.5
+
+    return To_Number(value)
+
+
+'''
+An observation from a station's METAR. The fields are in the same order the old KSLC_Fields list was, so
+observation[3] is still the gust. Anything that wasn't reported (or couldn't be read) is None.
+'''
+class METAR_Observation(NamedTuple):
+
+    ceiling_ft: Optional[float] = None          # WX_Rules.UNLIMITED_CEILING when there isn't a ceiling
+    visibility_sm: Optional[float] = None
+    wind_kt: Optional[float] = None
+    gust_kt: Optional[float] = None
+    wind_dir_deg: Optional[float] = None        # None when the wind is variable
+    temp_c: Optional[float] = None
+    dewp_c: Optional[float] = None
+    raw: Optional[str] = None                   # the METAR itself
+    station: Optional[str] = None
+    obs_time: Optional[str] = None              # when it was observed, e.g. '2023-11-25T18:53:00Z'
+    wind_variable_deg: Optional[tuple] = None   # (from, to) when the direction is varying, e.g. 280V350
+    layers: Optional[tuple] = None              # every sky layer, lowest first, as (cover, height in feet)
+    remarks: Optional[str] = None               # everything after RMK
+
+    '''
+    Reads an observation out of a feature's properties from the FAA's geojson
+    '''
+    @classmethod
+    def From_GeoJSON(cls, properties):
+
+        # no ceiling reported means there isn't one. The ceiling is reported in hundreds of feet
+        ceiling = properties.get('ceil', WX_Rules.UNLIMITED_CEILING / 100)
+        ceiling = To_Number(ceiling)
+        if ceiling is not None:
+            ceiling = ceiling * 100
+
+        try:
+            visibility = float(WX_Rules.Visibility_Miles(properties.get('visib')))
+        except (TypeError, ValueError):
+            visibility = None
+
+        return cls(ceiling_ft=ceiling,
+                   visibility_sm=visibility,
+                   wind_kt=To_Number(properties.get('wspd')),
+                   gust_kt=To_Number(properties.get('wgst')),
+                   wind_dir_deg=To_Number(properties.get('wdir')),
+                   temp_c=To_Number(properties.get('temp')),
+                   dewp_c=To_Number(properties.get('dewp')),
+                   raw=properties.get('rawOb'),
+                   station=properties.get('id') or properties.get('icaoId'),
+                   obs_time=properties.get('obsTime'))
+
+
+'''
+An observation from the Teal HQ weather station. The fields are in the same order the old TealHQ_Fields list was.
+Anything that wasn't reported (or couldn't be read) is None.
+'''
+class TealHQ_Observation(NamedTuple):
+
+    wind_mph: Optional[float] = None            # 10 minute average, or the current wind while sampling
+    gust_mph: Optional[float] = None            # 10 minute high, or the shortest high there is while sampling
+    temp_f: Optional[float] = None
+    wind_dir: Optional[str] = None              # as WeatherLink shows it, e.g. 'NW'
+    dewp_f: Optional[float] = None
+
+    '''
+    Reads an observation from the text shown on the WeatherLink summary page, e.g. ('5 mph', '12 mph', '47.1 °F',
+    'NW', '27.4 °F')
+    '''
+    @classmethod
+    def From_Text(cls, fields):
+        return cls(wind_mph=To_Number(fields[0]),
+                   gust_mph=To_Number(fields[1]),
+                   temp_f=To_Number(fields[2]),
+                   wind_dir=fields[3],
+                   dewp_f=To_Number(fields[4]))
+
+    '''
+    The wind direction in degrees, or None if it wasn't reported
+    '''
+    @property
+    def wind_dir_deg(self):
+        return Compass_Degrees(self.wind_dir)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+'''
+###########################################
+# PURPOSE: opt-in profiling for the long  #
+#          running loop. Every so many    #
+#          cycles it saves a CPU profile  #
+#          and a memory snapshot, and     #
+#          prints where memory grew       #
+###########################################
+'''
+
+'''
+Profiles one cycle in every so many and tracks memory between them. It's off unless WX_PROFILE is set to how many
+cycles apart the samples are.
+
+A sampled cycle is run under cProfile, along with any pull threads started through Wrap (on Python 3.12 and later
+the cycle's profile covers them itself), and the merged profile is saved as a .prof file (open it with pstats or
+snakeviz). At the same time a tracemalloc snapshot is saved as a .snapshot file, and the lines whose memory grew the
+most since the last sample are printed. Only the newest keep files of each kind are kept.
+'''
+class WX_Profile:
+
+    # initialize class fields
+    every = int(os.environ.get('WX_PROFILE') or 0)     # Cycles between samples, 0 is off
+    root = os.environ.get('WX_PROFILE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+    keep = 10                   # How many profiles and snapshots to keep
+    frames = 10                 # How deep a traceback tracemalloc keeps for each allocation
+    top = 10                    # How many growth sites to print
+
+    '''
+    Parameters:
+        every is the cycles between samples (WX_PROFILE is default)
+        root is where the files go (WX_PROFILE_DIR, or profiles/ next to this file, is default)
+    '''
+    def __init__(self, every=None, root=None):
+
+        if every is not None:
+            self.every = every
+        if root is not None:
+            self.root = root
+
+        self.cycle = 0
+        self.active = None          # the profiles of the cycle being sampled, None between samples
+        self.snapshot = None        # the last memory snapshot
+        self.lock = threading.Lock()
+
+        if self.every:
+            os.makedirs(self.root, exist_ok=True)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            print(f"Profiling every {self.every} cycles into {self.root}")
+
+    '''
+    Wraps a cycle, for use in a with. Every every cycles it's profiled and memory is checked
+    '''
+    def Cycle(self):
+        return _Cycle(self)
+
+    '''
+    Wraps a function that runs in another thread, so it's profiled along with the cycle it was started in
+    '''
+    def Wrap(self, function):
+
+        def wrapped(*args, **kwargs):
+
+            profiles = self.active
+            if profiles is None:
+                return function(*args, **kwargs)
+
+            # from Python 3.12 only one profiler can run at a time, and the cycle's is already running. It sees every
+            # thread there, so this one's left to it
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return function(*args, **kwargs)
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self.lock:
+                    profiles.append(profile)
+
+        return wrapped
+
+    '''
+    Saves the cycle's profiles as one file, and prints how long the cycle took and where
+    '''
+    def Save_Profile(self, profiles):
+
+        path = os.path.join(self.root, self.Name('.prof'))
+
+        with self.lock:
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+
+        stats.dump_stats(path)
+        self.Rotate('.prof')
+
+        # the functions that took the most time themselves
+        worst = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:3]
+        print(f"Profiled cycle {self.cycle} ({stats.total_tt * 1000:.1f} ms) to {path}. Most time in: " +
+              ", ".join(f"{pstats.func_std_string(function)} {timing[2] * 1000:.1f} ms" for function, timing in worst))
+
+    '''
+    Saves a memory snapshot, and prints the lines whose memory grew the most since the last one
+    '''
+    def Check_Memory(self):
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                                              tracemalloc.Filter(False, '<frozen importlib._bootstrap>')))
+        snapshot.dump(os.path.join(self.root, self.Name('.snapshot')))
+        self.Rotate('.snapshot')
+
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Memory at cycle {self.cycle}: {current / 2 ** 20:.1f} MB traced, {peak / 2 ** 20:.1f} MB peak")
+
+        if self.snapshot is not None:
+            for stat in snapshot.compare_to(self.snapshot, 'lineno')[:self.top]:
+                if stat.size_diff > 0:
+                    print(f"    +{stat.size_diff / 1024:.1f} KiB ({stat.count_diff:+d} blocks) {stat.traceback[0]}")
+
+        self.snapshot = snapshot
+
+    '''
+    The file name for this cycle's sample. It starts with the time, so names sort oldest first across restarts
+    '''
+    def Name(self, suffix):
+        return f"cycle-{time.strftime('%Y%m%d-%H%M%S')}-{self.cycle}{suffix}"
+
+    '''
+    Deletes all but the newest keep files that end in suffix
+    '''
+    def Rotate(self, suffix):
+
+        names = sorted(name for name in os.listdir(self.root) if name.startswith('cycle-') and name.endswith(suffix))
+        for name in names[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError as e:
+                print(f"Couldn't remove an old profile: {e}")
+
+
+'''
+What WX_Profile.Cycle hands back
+'''
+class _Cycle:
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def __enter__(self):
+
+        profiler = self.profiler
+        profiler.cycle += 1
+        self.sampled = bool(profiler.every) and (profiler.cycle % profiler.every == 0)
+
+        if self.sampled:
+            self.profile = cProfile.Profile()
+            profiler.active = [self.profile]
+            self.profile.enable()
+
+        return profiler
+
+    def __exit__(self, kind, value, traceback):
+
+        if self.sampled:
+            self.profile.disable()
+            profiles, self.profiler.active = self.profiler.active, None
+
+            try:
+                self.profiler.Save_Profile(profiles)
+                self.profiler.Check_Memory()
+            except Exception as e:
+                print(f"Couldn't save the profile: {e}")
+
+        return False
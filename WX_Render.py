@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+import os
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+'''
+###########################################
+# PURPOSE: draws what Give_To_Display     #
+#          hands over into a frame for    #
+#          WX_Display, redrawing only the #
+#          parts of the screen that       #
+#          changed                        #
+###########################################
+'''
+
+'''
+Draws frames and remembers them. Fonts, text sizes and whole frames are all cached, so a cycle where nothing changed
+costs a dictionary lookup, and one where only the wind changed only redraws the wind.
+'''
+class WX_Render:
+
+    # initialize class fields
+    size = (800, 480)                           # the screen, in pixels
+    font_path = os.environ.get('WX_FONT')       # a TrueType font to draw with (PIL's own font is default)
+    frames_kept = 32                            # how many drawn frames to keep around
+    text_color = 'black'                        # for words that don't have a color of their own
+    smallest_font = 10                          # text that still doesn't fit at this size gets cut off
+    stale_box = (0, 92, 800, 120)               # where a frame from before a restart says it's out of date
+    stale_colors = ('black', 'white')           # (background, text) of that notice
+
+    # Where everything goes: (what it is, box on the screen, font size, which of word_colors it's drawn in)
+    LAYOUT = (('status',        (0, 0, 800, 120),       48, None),
+              ('ceiling',       (0, 120, 400, 220),     36, 0),
+              ('visibility',    (400, 120, 800, 220),   36, 1),
+              ('wind',          (0, 220, 400, 320),     36, 2),
+              ('gust',          (400, 220, 800, 320),   36, 3),
+              ('metar',         (0, 320, 800, 480),     18, None))
+
+    def __init__(self):
+
+        self.fonts = {}             # by size
+        self.measures = {}          # text sizes, by (text, font size)
+        self.fits = {}              # the font size text fits a width at, by (text, font size, width)
+        self.frames = OrderedDict() # drawn frames, by Key, least recently used first
+        self.frame = None           # the frame on the screen
+        self.shown = None           # what's in each region of it, by region name
+
+    '''
+    Gets a font, loading it the first time
+    '''
+    def Font(self, size):
+
+        font = self.fonts.get(size)
+        if font is None:
+            if self.font_path:
+                font = ImageFont.truetype(self.font_path, size)
+            else:
+                font = ImageFont.load_default(size)
+            self.fonts[size] = font
+
+        return font
+
+    '''
+    Gets how big text is at a font size. Returns (left, top, right, bottom) like PIL's getbbox
+    '''
+    def Measure(self, text, size):
+
+        key = (text, size)
+        box = self.measures.get(key)
+        if box is None:
+            box = self.Font(size).getbbox(text)
+            self.measures[key] = box
+
+        return box
+
+    '''
+    Gets the biggest font size, up to size, that text fits in width at
+    '''
+    def Fit(self, text, size, width):
+
+        key = (text, size, width)
+        fit = self.fits.get(key)
+        if fit is None:
+            fit = size
+            while fit > self.smallest_font:
+                left, top, right, bottom = self.Measure(text, fit)
+                if right - left <= width:
+                    break
+                fit -= 2
+            self.fits[key] = fit
+
+        return fit
+
+    '''
+    The cache key for a payload from Give_To_Display
+    '''
+    def Key(self, payload):
+        return tuple((name, tuple(value) if isinstance(value, list) else value)
+                     for name, value in sorted(payload.items()))
+
+    '''
+    Works out what goes in each region. Returns (text, text color, background color) by region name
+    '''
+    def Regions(self, payload):
+
+        background = payload['background_color']
+        word_colors = payload['word_colors']
+
+        regions = {}
+        for name, box, size, color in self.LAYOUT:
+            text = payload.get(name) or ''
+            if (color is not None) and (word_colors[color] is not None):
+                regions[name] = (text, word_colors[color], background)
+            else:
+                regions[name] = (text, self.text_color, background)
+
+        return regions
+
+    '''
+    Draws a frame for a payload from Give_To_Display. Returns (frame, dirty), where frame is a PIL image and dirty
+    are the boxes on the screen that changed since the last frame. Nothing changed when dirty is empty.
+
+    Only the changed regions are drawn, on top of a copy of the last frame. A frame that's been drawn before comes
+    straight out of the cache.
+    '''
+    def Render(self, payload):
+
+        regions = self.Regions(payload)
+        changed = [(name, box, size) for name, box, size, color in self.LAYOUT
+                   if (self.shown is None) or (self.shown[name] != regions[name])]
+
+        if not changed:
+            return self.frame, []
+
+        key = self.Key(payload)
+        frame = self.frames.get(key)
+
+        if frame is not None:
+            self.frames.move_to_end(key)
+        else:
+            # cached frames are never drawn on, so start from a copy
+            if self.frame is not None:
+                frame = self.frame.copy()
+            else:
+                frame = Image.new('RGB', self.size, payload['background_color'])
+
+            draw = ImageDraw.Draw(frame)
+            for name, box, size in changed:
+                text, color, background = regions[name]
+                draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=background)
+
+                # centered in its box, shrunk if it doesn't fit
+                size = self.Fit(text, size, box[2] - box[0])
+                left, top, right, bottom = self.Measure(text, size)
+                x = box[0] + (box[2] - box[0] - (right - left)) // 2 - left
+                y = box[1] + (box[3] - box[1] - (bottom - top)) // 2 - top
+                draw.text((x, y), text, fill=color, font=self.Font(size))
+
+            self.frames[key] = frame
+            if len(self.frames) > self.frames_kept:
+                self.frames.popitem(last=False)
+
+        self.frame = frame
+        self.shown = regions
+
+        return frame, [box for name, box, size in changed]
+
+    '''
+    Draws the last frame from before a restart with a notice across it saying how old it is. Returns the frame.
+
+    The next Render redraws everything, which takes the notice off as soon as a fresh cycle comes in.
+
+    Parameters:
+        payload is what Give_To_Display handed over when it was saved
+        frame is the frame that was drawn for it (None draws it again from payload)
+        saved is when it was saved, in seconds since the epoch
+    '''
+    def Render_Stale(self, payload, frame, saved):
+
+        if frame is None:
+            frame, dirty = self.Render(payload)
+        frame = frame.convert('RGB').resize(self.size) if frame.size != self.size else frame.convert('RGB')
+
+        background, color = self.stale_colors
+        text = time.strftime("Last known %H:%M - updating...", time.localtime(saved))
+        box = self.stale_box
+
+        draw = ImageDraw.Draw(frame)
+        draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=background)
+        size = self.Fit(text, box[3] - box[1] - 6, box[2] - box[0])
+        left, top, right, bottom = self.Measure(text, size)
+        draw.text((box[0] + (box[2] - box[0] - (right - left)) // 2 - left,
+                   box[1] + (box[3] - box[1] - (bottom - top)) // 2 - top), text, fill=color, font=self.Font(size))
+
+        # nothing on the screen matches a region any more, so it all gets drawn fresh
+        self.frame = frame
+        self.shown = None
+
+        return frame
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+import WX_Rules
+from WX_History import WX_History
+
+'''
+###########################################
+# PURPOSE: replays the go/no-go rules     #
+#          over archived observations     #
+#          all at once with NumPy, to see #
+#          how often they'd have          #
+#          grounded us                    #
+###########################################
+'''
+
+ERROR = len(WX_Rules.STATUSES)      # the status code for an observation that can't be analyzed
+NAMES = WX_Rules.STATUSES + ('Error',)
+
+COLUMNS = ('ceiling', 'visibility', 'wind', 'gust', 'teal_wind', 'teal_gust')     # the columns the rules use
+
+# the status code (position in WX_Rules.STATUSES) of every entry in WX_Rules.RULES
+RULE_STATUS = np.array([WX_Rules.STATUSES.index(rule[0]) for rule in WX_Rules.RULES], dtype=np.uint8)
+
+
+'''
+Applies the rules to whole arrays of observations at once. Works the same way as WX_Controller.Analyze: each
+condition is put in its band with the same edges, and the band indices pick the entry in WX_Rules.RULES.
+
+A missing gust means there wasn't any. A missing wind is taken as too windy to fly, wind and gust both, the same as
+Analyze does when it can't pick the worse wind, and a missing ceiling or visibility can't be analyzed (the history
+saves no ceiling as WX_Rules.UNLIMITED_CEILING, so a missing one is one that wasn't known). Teal HQ's wind and gust (mph) are optional, and where they're given the worse of them
+and the station's wind and gust is used.
+
+Returns (rules, statuses): the entry in WX_Rules.RULES for each observation (-1 where it couldn't be analyzed) and
+its status code (a position in NAMES).
+'''
+def Evaluate(ceiling, visibility, wind, gust, teal_wind=None, teal_gust=None):
+
+    gust = np.where(np.isnan(gust), 0.0, gust)
+    windless = np.isnan(wind)
+
+    # whatever weather is worse sets the status. fmax skips over the NaNs where Teal HQ had nothing
+    if teal_wind is not None:
+        wind = np.fmax(wind, np.asarray(teal_wind) / WX_Rules.MPH_PER_KNOT)
+    if teal_gust is not None:
+        gust = np.fmax(gust, np.asarray(teal_gust) / WX_Rules.MPH_PER_KNOT)
+
+    # Analyze can't pick the worse wind without the station's, Teal HQ or not, and uses 99999 for both
+    wind = np.where(windless, 99999, wind)
+    gust = np.where(windless, 99999, gust)
+
+    bands = [np.searchsorted(edges, values, side='right')
+             for (edges, _), values in zip(WX_Rules.CONDITIONS, (ceiling, visibility, wind, gust))]
+    rules = WX_Rules.Index(bands)
+
+    ok = ~(np.isnan(ceiling) | np.isnan(visibility) | (ceiling < 0) | (visibility < 0))
+    rules = np.where(ok, rules, -1)
+    statuses = np.where(ok, RULE_STATUS[np.clip(rules, 0, None)], ERROR).astype(np.uint8)
+
+    return rules, statuses
+
+'''
+Counts how many observations ended up with each status. Returns {status name: count}
+'''
+def Count(statuses):
+
+    counts = np.bincount(statuses, minlength=len(NAMES))
+    return {name: int(count) for name, count in zip(NAMES, counts)}
+
+'''
+Finds every time the status changed. Returns (times, from codes, to codes), one entry per change
+'''
+def Transitions(times, statuses):
+
+    changes = np.flatnonzero(statuses[1:] != statuses[:-1]) + 1
+    return times[changes], statuses[changes - 1], statuses[changes]
+
+'''
+Loads a station's saved cycles from the history. Returns the columns as NumPy arrays, read straight from the
+column files.
+'''
+def Load_History(station, root=None):
+
+    store = WX_History(root).Store(station)
+    count = len(store)
+
+    columns = {}
+    for name, fmt in WX_History.COLUMNS:
+        columns[name] = np.memmap(os.path.join(store.path, name + '.col'), dtype=np.dtype(fmt), mode='r', shape=(count,)) \
+            if count else np.zeros(0, dtype=np.dtype(fmt))
+
+    store.Close()
+    return columns
+
+'''
+Loads archived observations from a CSV file with a header row. It needs time, ceiling (feet), visibility (statute
+miles), wind and gust (knots) columns, and can have teal_wind and teal_gust (mph). Times can be seconds since the
+epoch or dates like 2023-11-25 18:53. Empty cells and M (how the ASOS archives mark missing data) count as missing,
+except that an empty ceiling is how the archives say there isn't one.
+'''
+def Load_CSV(path):
+
+    with open(path, newline='') as archive:
+        reader = csv.reader(archive)
+        header = [name.strip() for name in next(reader)]
+        cells = np.array([row for row in reader if row], dtype=str).reshape(-1, len(header))
+
+    columns = {}
+    for i, name in enumerate(header):
+        values = np.char.strip(cells[:, i])
+        if name == 'time':
+            try:
+                columns[name] = values.astype(np.float64)
+            except ValueError:
+                columns[name] = values.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+        elif name in COLUMNS:
+            if name == 'ceiling':
+                values = np.where(values == '', str(WX_Rules.UNLIMITED_CEILING), values)
+            columns[name] = np.where(np.isin(values, ('', 'M')), 'nan', values).astype(np.float64)
+
+    return columns
+
+'''
+Replays the rules over loaded columns. Returns (counts, transitions) like Count and Transitions
+'''
+def Replay(columns):
+
+    rules, statuses = Evaluate(columns['ceiling'], columns['visibility'], columns['wind'], columns['gust'],
+                               columns.get('teal_wind'), columns.get('teal_gust'))
+
+    return Count(statuses), Transitions(np.asarray(columns['time']), statuses)
+
+
+'''
+Prints a replay of a CSV archive or a station's history
+'''
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Replay the go/no-go rules over archived observations")
+    parser.add_argument('source', help="a CSV archive, or a station id to replay from the history")
+    parser.add_argument('--history', help="the history directory (WX_HISTORY_DIR is default)")
+    parser.add_argument('--transitions', type=int, default=20, help="how many status changes to list")
+    args = parser.parse_args()
+
+    if os.path.isfile(args.source):
+        columns = Load_CSV(args.source)
+    else:
+        columns = Load_History(args.source.upper(), args.history)
+
+    if len(columns['time']) == 0:
+        sys.exit("Nothing to replay")
+
+    counts, (times, before, after) = Replay(columns)
+
+    total = sum(counts.values())
+    for name, count in counts.items():
+        print(f"{name:<35} {count:>8}  {100 * count / total:6.2f}%")
+
+    print(f"\n{len(times)} status changes")
+    for t, a, b in zip(times[:args.transitions], before, after):
+        print(f"{np.datetime64(int(t), 's')}  {NAMES[a]} -> {NAMES[b]}")
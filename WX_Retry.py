@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import random
+import threading
+import time
+
+'''
+###########################################
+# PURPOSE: how hard to keep trying a      #
+#          website that isn't answering,  #
+#          and when to stop trying it for #
+#          a while                        #
+###########################################
+'''
+
+'''
+How many times to try a request, and how long to wait between tries. The waits grow exponentially and are jittered
+so kiosks that lost the same site at the same time don't all come back at once. Every request also gets a total
+time budget, and a retry that wouldn't finish inside it isn't started.
+'''
+class Retry_Policy:
+
+    # initialize class fields
+    tries = 5                   # How many times to try before giving up
+    base = 1.0                  # Seconds to wait after the first failure, before jitter
+    cap = 10.0                  # The longest wait between tries, before jitter
+    budget = 15.0               # Seconds a request gets, retries included, when it isn't given a deadline
+    timeout = 5.0               # Seconds a single try can take
+
+    '''
+    How long to wait after a failed try. Full jitter: anywhere from 0 up to the exponential backoff for that try
+
+    Parameter:
+        attempt is how many tries have failed so far, starting at 1
+    '''
+    def Delay(self, attempt):
+        return random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+
+
+'''
+Stops calling a website that keeps failing. After failure_limit failures in a row the breaker opens and requests are
+turned away right away. Once reset_after seconds have gone by, one request at a time is let through to test the
+site - if it works the breaker closes, if it fails the breaker opens again.
+'''
+class Circuit_Breaker:
+
+    # initialize class fields
+    failure_limit = 5           # Failures in a row that open the breaker
+    reset_after = 120           # Seconds to leave the breaker open before testing the site again
+
+    '''
+    Parameter:
+        clock gives the time in seconds (time.monotonic is default)
+    '''
+    def __init__(self, clock=time.monotonic):
+
+        self.clock = clock
+        self.failures = 0           # failures in a row
+        self.opened = None          # when the breaker last opened, None while closed
+        self.testing = False        # a test request is out while the breaker is half open
+        self.lock = threading.Lock()
+
+    '''
+    Is the breaker open right now?
+    '''
+    def Is_Open(self):
+        return (self.opened is not None) and (self.clock() - self.opened < self.reset_after)
+
+    '''
+    Asks the breaker if a request can go out. True if it's closed, or if it's time to test the site
+    '''
+    def Allow(self):
+
+        with self.lock:
+            if self.opened is None:
+                return True
+
+            if self.Is_Open() or self.testing:
+                return False
+
+            self.testing = True
+            return True
+
+    '''
+    Hands back the test request Allow let through, when it ended without working or failing (it ran out of time, or
+    something other than the site went wrong), so the next request can test the site instead
+    '''
+    def Release(self):
+
+        with self.lock:
+            self.testing = False
+
+    '''
+    Tells the breaker a request worked
+    '''
+    def Succeeded(self):
+
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.testing = False
+
+    '''
+    Tells the breaker a request failed
+    '''
+    def Failed(self):
+
+        with self.lock:
+            self.failures += 1
+            if self.testing or (self.failures >= self.failure_limit):
+                self.opened = self.clock()
+            self.testing = False
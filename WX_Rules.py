@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import bisect
+import itertools
+import re
+
+'''
+###########################################
+# PURPOSE: the go/no-go rules. The        #
+#          ceiling, visibility, wind and  #
+#          gust limits are kept here as   #
+#          data and compiled into one     #
+#          lookup table                   #
+#                                         #
+#          This, WX_Observation and       #
+#          WX_Metar are the core: they    #
+#          only use the standard library, #
+#          so they load in milliseconds,  #
+#          under Pyodide too              #
+###########################################
+'''
+
+# the statuses, from best to worst. A status's position is its severity
+STATUSES = ("Good to Fly \u2191", "Okay to Fly with Restrictions \u2194", "Do Not Fly \u2193")
+BACKGROUNDS = ('green', 'yellow', 'red')
+
+# Each condition is split into bands by its edges. A value belongs to the first band whose edge it is below, so
+# the edge itself is in the band above it. Every band has a severity and the color its word is drawn in
+#                        edges          bands, lowest value first: (severity, word color)
+CEILING_FEET =          ((500, 900),    ((2, 'pink'), (1, 'orange'), (0, None)))
+VISIBILITY_MILES =      ((3,),          ((2, 'pink'), (0, None)))
+WIND_KNOTS =            ((9.6, 15.6),   ((0, None), (1, 'orange'), (2, 'pink')))
+GUST_KNOTS =            ((15.6, 21.7),  ((0, None), (1, 'orange'), (2, 'pink')))
+
+CONDITIONS = (CEILING_FEET, VISIBILITY_MILES, WIND_KNOTS, GUST_KNOTS)     # in the same order as word_colors
+
+UNLIMITED_CEILING = 99999      # what a station with no ceiling reports
+MPH_PER_KNOT = 1.151           # Teal HQ reports in mph, the rules are in knots
+
+_number = re.compile(r'(\d+(?:\.\d+)?)')
+_fraction = re.compile(r'(?:(\d+)\s+)?(\d+)/(\d+)')
+
+
+'''
+Builds the lookup table. There's one entry for every combination of bands, laid out so the entry for band indices
+(c, v, w, g) is at Index((c, v, w, g)). Each entry is (status, background_color, word_colors). The worst band sets
+the status, and each condition's band sets its word color.
+'''
+def Compile_Rules(conditions=CONDITIONS):
+
+    table = []
+    for bands in itertools.product(*(range(len(condition[1])) for condition in conditions)):
+        picks = [condition[1][band] for condition, band in zip(conditions, bands)]
+        severity = max(pick[0] for pick in picks)
+        table.append((STATUSES[severity], BACKGROUNDS[severity], tuple(pick[1] for pick in picks)))
+
+    return tuple(table)
+
+RULES = Compile_Rules()
+
+# how far apart neighboring bands of each condition are in RULES
+_strides = (len(VISIBILITY_MILES[1]) * len(WIND_KNOTS[1]) * len(GUST_KNOTS[1]),
+            len(WIND_KNOTS[1]) * len(GUST_KNOTS[1]),
+            len(GUST_KNOTS[1]),
+            1)
+
+
+'''
+Turns a reported ceiling into feet. Throws a type error if nothing is reported and a value error if it's extrenuous.
+
+Parameter:
+    c is the ceiling in feet. It can be a number or text like '2500+'
+'''
+def Ceiling_Feet(c):
+
+    if c is None:
+        raise TypeError("Expecting a ceiling")
+
+    if isinstance(c, str):
+        match = _number.search(c)
+        if match is None:
+            raise ValueError(f"Can't read a ceiling from {c!r}")
+        c = float(match.group(1))
+
+    if (c < 0) or (c > 100000):
+        raise ValueError("Ceiling of 0 to 100000 feet expected")
+
+    return c
+
+'''
+Turns a reported visibility into statute miles. Throws a type error if nothing is reported and a value error if it's
+extrenuous.
+
+Parameter:
+    v is the visibility. It can be a number or text like '10+', '1/2' or '1 1/2SM'
+'''
+def Visibility_Miles(v):
+
+    if v is None:
+        raise TypeError("Expecting a visibility")
+
+    if isinstance(v, str):
+        match = _fraction.search(v)
+        if match is not None:
+            v = int(match.group(1) or 0) + int(match.group(2)) / int(match.group(3))
+        else:
+            match = _number.search(v)
+            if match is None:
+                raise ValueError(f"Can't read a visibility from {v!r}")
+            v = float(match.group(1))
+
+    if (v < 0) or (v > 100):
+        raise ValueError("Visibility of 0 to 100 miles expected")
+
+    return v
+
+'''
+Puts each condition in its band. Returns the band indices (ceiling, visibility, wind, gust).
+'''
+def Classify(ceiling, visibility, wind, gust):
+    return (bisect.bisect_right(CEILING_FEET[0], Ceiling_Feet(ceiling)),
+            bisect.bisect_right(VISIBILITY_MILES[0], Visibility_Miles(visibility)),
+            bisect.bisect_right(WIND_KNOTS[0], wind),
+            bisect.bisect_right(GUST_KNOTS[0], gust))
+
+'''
+Where the entry for a set of band indices is in RULES
+'''
+def Index(bands):
+    return bands[0] * _strides[0] + bands[1] * _strides[1] + bands[2] * _strides[2] + bands[3]
+
+'''
+Gets (status, background_color, word_colors) for a set of band indices
+'''
+def Lookup(bands):
+    return RULES[Index(bands)]
+
+'''
+Picks the worse wind and gust, in knots, between a METAR and Teal HQ. A gust that isn't reported counts as no gust,
+and Teal HQ is left out of anything it didn't report. Returns (wind, gust, teal_wind_won, teal_gust_won)
+
+Parameters:
+    wind_kt and gust_kt are from the METAR
+    teal_wind_mph and teal_gust_mph are from Teal HQ (None, for a station that isn't home, is default)
+'''
+def Worst_Wind(wind_kt, gust_kt, teal_wind_mph=None, teal_gust_mph=None):
+
+    wind = float(wind_kt)
+    gust = float(gust_kt) if gust_kt is not None else 0.0
+    teal_wind = teal_wind_mph / MPH_PER_KNOT if teal_wind_mph is not None else 0.0
+    teal_gust = teal_gust_mph / MPH_PER_KNOT if teal_gust_mph is not None else 0.0
+
+    return max(wind, teal_wind), max(gust, teal_gust), teal_wind > wind, teal_gust > gust
+
+'''
+Gets (status, background_color, word_colors) for an observation. Wind and gust are in knots.
+'''
+def Evaluate(ceiling, visibility, wind, gust):
+    return RULES[Index(Classify(ceiling, visibility, wind, gust))]
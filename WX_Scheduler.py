@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import calendar
+import time
+
+'''
+###########################################
+# PURPOSE: decides when to poll each      #
+#          source. METARs are polled      #
+#          tightly around when they're    #
+#          issued and backed off between, #
+#          Teal HQ on its own cadence     #
+###########################################
+'''
+
+'''
+Keeps track of when each source should be polled next.
+
+Routine METARs go out around :53 past the hour, so from METAR_window[0] to METAR_window[1] minutes past the hour the
+METARs are polled every METAR_fast seconds until the new one shows up. Once it has, or outside the window, they're
+polled every METAR_slow seconds so a SPECI still gets picked up. Teal HQ changes all the time, so it's polled every
+TealHQ_every seconds no matter what. TAFs only change every few hours, so every TAF_every seconds is plenty to catch
+an amendment.
+'''
+class WX_Scheduler:
+
+    # initialize class fields
+    METAR_window = (50, 5)      # minutes past the hour the routine METAR window opens and closes (it wraps the hour)
+    METAR_fast = 30             # seconds between METAR polls while waiting on the routine METAR
+    METAR_slow = 300            # seconds between METAR polls the rest of the time
+    TealHQ_every = 30           # seconds between Teal HQ polls
+    TAF_every = 600             # seconds between TAF polls
+    slack = 1                   # sources due within this many seconds of each other get polled together
+
+    due = None                  # when each source is due next, by source name
+    got_window = None           # the start of the last window the routine METAR came in during
+
+    '''
+    Initializes the schedule with everything due right away
+
+    Parameter:
+        clock gives the time in seconds since the epoch (time.time is default)
+    '''
+    def __init__(self, clock=time.time):
+
+        self.clock = clock
+        now = clock()
+        self.due = {'METAR': now, 'Teal HQ': now, 'TAF': now}
+
+    '''
+    Finds the routine METAR window that's open at time t, or the next one if none is. Returns (start, end)
+    '''
+    def Window(self, t):
+
+        length = ((self.METAR_window[1] - self.METAR_window[0]) % 60) * 60
+        start = (t // 3600) * 3600 - 3600 + self.METAR_window[0] * 60
+
+        while t >= start + length:
+            start += 3600
+
+        return start, start + length
+
+    '''
+    Gets the sources that should be polled next and when. Returns (sources, when)
+    '''
+    def Next(self):
+
+        when = min(self.due.values())
+        sources = tuple(name for name, t in self.due.items() if t <= when + self.slack)
+
+        return sources, when
+
+    '''
+    Turns an ISO time like '2023-11-25T18:53:00Z' into seconds since the epoch, or None if it can't be read
+    '''
+    def Observed_At(self, observed):
+
+        try:
+            return calendar.timegm(time.strptime(observed, '%Y-%m-%dT%H:%M:%SZ'))
+        except (TypeError, ValueError):
+            return None
+
+    '''
+    Schedules the next poll of the sources that were just polled
+
+    Parameters:
+        sources are the sources that were polled
+        observed is when home's METAR was observed, as an ISO time like '2023-11-25T18:53:00Z' (None if there isn't one)
+    '''
+    def Polled(self, sources, observed=None):
+
+        now = self.clock()
+
+        if 'Teal HQ' in sources:
+            self.due['Teal HQ'] = now + self.TealHQ_every
+
+        if 'TAF' in sources:
+            self.due['TAF'] = now + self.TAF_every
+
+        if 'METAR' in sources:
+            start, end = self.Window(now)
+            in_window = start <= now
+
+            # a METAR observed during the window is the routine one, so we can back off until the next window. Going
+            # by when it was observed, rather than whether it changed, means last hour's isn't mistaken for it
+            observed_at = self.Observed_At(observed)
+            if in_window and (observed_at is not None) and (observed_at >= start):
+                self.got_window = start
+
+            if in_window and (self.got_window != start):
+                self.due['METAR'] = now + self.METAR_fast
+            else:
+                next_start = start if not in_window else start + 3600
+                self.due['METAR'] = min(now + self.METAR_slow, next_start)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+'''
+###########################################
+# PURPOSE: runs the WeatherLink browser   #
+#          in a worker process, so a hung #
+#          or bloated Firefox can be      #
+#          killed and replaced without    #
+#          taking the display loop down   #
+###########################################
+'''
+
+'''
+Adds up the resident memory of a process and every process under it, in MB. Returns None where there's no /proc
+to read it from
+'''
+def Tree_RSS_MB(pid):
+
+    if not os.path.isdir('/proc'):
+        return None
+
+    # who started who
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as stat:
+                    parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+
+    total = 0
+    stack = [pid]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, ()))
+        try:
+            with open(f'/proc/{pid}/statm') as statm:
+                total += int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            pass
+
+    return total / 2 ** 20
+
+
+'''
+A headless Firefox kept on one page. It only lives in the worker process
+'''
+class Browser:
+
+    '''
+    Parameter:
+        geckodriver_path is where geckodriver is
+    '''
+    def __init__(self, geckodriver_path):
+
+        from selenium import webdriver
+        from selenium.webdriver.firefox.options import Options
+        from selenium.webdriver.firefox.service import Service
+
+        options = Options()
+        options.add_argument('--headless')
+        self.service = Service(geckodriver_path)
+        self.driver = webdriver.Firefox(service=self.service, options=options)
+
+        self.url = None             # the page that's up
+        self.loaded = None          # the time.monotonic() it was last loaded, None if it needs loading
+        self.pages = 0              # how many pages have been read since the browser started
+
+    '''
+    How much memory geckodriver and Firefox are using, in MB
+    '''
+    def RSS_MB(self):
+        return Tree_RSS_MB(self.service.process.pid)
+
+    '''
+    Reads cells out of a page. The page is loaded the first time and refreshed in place after it's been up
+    refresh_after seconds. Every cell is read in one script run in the page, which is retried until every cell turns
+    up or wait runs out. A cell that still isn't there (or shows --) comes back as None instead of failing the read.
+
+    Parameters:
+        url is the page
+        cells are the XPaths of each cell, best first
+        script runs in the page and reads the cells, given cells as its argument
+        wait is how many seconds to give the page to render
+        refresh_after is how many seconds to leave the page up before refreshing it
+    '''
+    def Read(self, url, cells, script, wait, refresh_after):
+
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        # load the page the first time, and refresh it once it's been up a while
+        now = time.monotonic()
+        if (self.loaded is None) or (url != self.url):
+            self.driver.get(url)
+            self.url = url
+            self.loaded = now
+        elif now - self.loaded >= refresh_after:
+            self.driver.refresh()
+            self.loaded = now
+
+        self.pages += 1
+
+        def read(driver):
+            return driver.execute_script(script, cells)
+
+        # the page has rendered once every cell turns up
+        def rendered(driver):
+            found = read(driver)
+            return found if None not in found else False
+
+        try:
+            found = WebDriverWait(self.driver, wait).until(rendered)
+        except TimeoutException:
+            found = read(self.driver)
+            self.loaded = None      # start over with a fresh page next time
+
+            if all(cell is None for cell in found):
+                raise WebDriverException("The page never rendered")
+            print("Some of the cells weren't on the page. Using what was there.")
+
+        return [cell if cell not in (None, '', '--') else None for cell in found]
+
+    '''
+    Closes Firefox
+    '''
+    def Quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Firefox didn't close cleanly: {e}")
+
+
+'''
+What the worker process runs. It reads pages for each job that comes in and sends back what it found, and starts a
+new browser after restart_pages pages or once the browser is using more than restart_mb MB. A job of None ends it.
+
+Every result is (job number, cells, error, RSS of the worker and its browser in MB).
+'''
+def Worker(jobs, results, geckodriver_path, restart_pages, restart_mb):
+
+    # its own process group, so the supervisor can kill the browser along with it
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+
+    # being terminated still closes the browser
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    browser = None
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            number, request = job
+
+            try:
+                if browser is None:
+                    browser = Browser(geckodriver_path)
+                cells, error = browser.Read(**request), None
+            except Exception as e:
+                cells, error = None, f"{type(e).__name__}: {e}"
+
+                # a browser that's failing gets a fresh start
+                if browser is not None:
+                    browser.Quit()
+                    browser = None
+
+            if browser is not None:
+                browser_mb = browser.RSS_MB()
+                if (browser.pages >= restart_pages) or ((browser_mb is not None) and (browser_mb > restart_mb)):
+                    print(f"Restarting Firefox after {browser.pages} pages at {browser_mb or 0:.0f} MB.")
+                    browser.Quit()
+                    browser = None
+
+            results.put((number, cells, error, Tree_RSS_MB(os.getpid())))
+    finally:
+        if browser is not None:
+            browser.Quit()
+
+
+'''
+Runs the browser in a worker process and hands it jobs over a queue. A job that takes longer than its timeout gets
+the worker (and its browser) killed, and the next job starts a fresh one. So does a worker that grows past
+rss_limit_mb. The worker restarts the browser on its own every restart_pages pages or restart_mb MB.
+'''
+class WX_Scraper:
+
+    # initialize class fields
+    timeout = 30                # Seconds a job gets, when it isn't given a timeout, before the worker is killed
+    restart_pages = 500         # Pages a browser reads before it's restarted
+    restart_mb = 1024           # MB a browser can grow to before it's restarted
+    rss_limit_mb = 2048         # MB the worker and its browser can grow to before the worker is killed
+
+    worker = None               # the worker process, None until the first job
+    jobs = None                 # the jobs going to the worker
+    results = None              # the results coming back from it
+
+    '''
+    Parameter:
+        geckodriver_path is where geckodriver is
+    '''
+    def __init__(self, geckodriver_path):
+
+        self.geckodriver_path = geckodriver_path
+        self.context = multiprocessing.get_context('spawn')     # a fork would copy the controller's threads
+        self.number = 0
+
+    '''
+    Starts a worker, with new queues in case the last worker died halfway through using them
+    '''
+    def Start(self):
+
+        self.jobs = self.context.Queue()
+        self.results = self.context.Queue()
+        self.worker = self.context.Process(target=Worker, name='WX_Scraper', daemon=True,
+                                           args=(self.jobs, self.results, self.geckodriver_path,
+                                                 self.restart_pages, self.restart_mb))
+        self.worker.start()
+
+    '''
+    Stops the worker
+
+    Parameter:
+        kill is True to kill it (and its browser) right away instead of letting it close the browser
+    '''
+    def Stop(self, kill=False):
+
+        if self.worker is None:
+            return
+
+        if not kill:
+            self.jobs.put(None)
+            self.worker.join(10)
+
+        if self.worker.is_alive():
+            try:
+                os.killpg(self.worker.pid, signal.SIGKILL)
+            except (AttributeError, OSError):
+                self.worker.kill()
+            self.worker.join()
+
+        self.worker = None
+
+    '''
+    Has the worker read a page, starting one if there isn't one. Returns the cells, and raises TimeoutError if it
+    takes too long or RuntimeError if the worker couldn't read the page
+
+    Parameters:
+        request is the keyword arguments for Browser.Read
+        timeout is how many seconds to wait (the class timeout is default)
+    '''
+    def Scrape(self, request, timeout=None):
+
+        if (self.worker is None) or not self.worker.is_alive():
+            self.Start()
+
+        self.number += 1
+        self.jobs.put((self.number, request))
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+
+        # an old result may still come in from a job that was given up on
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                number, cells, error, rss = self.results.get(timeout=max(0, min(1, remaining)))
+            except queue.Empty:
+                if not self.worker.is_alive():
+                    self.worker = None
+                    raise RuntimeError("The scraper died")
+                if remaining > 1:
+                    continue
+
+                print("The scraper stopped answering. Killing it, and starting a new one next time.")
+                self.Stop(kill=True)
+                raise TimeoutError("The scraper took too long")
+
+            if number == self.number:
+                break
+
+        if (rss is not None) and (rss > self.rss_limit_mb):
+            print(f"The scraper grew to {rss:.0f} MB. Starting a new one next time.")
+            self.Stop()
+
+        if error is not None:
+            raise RuntimeError(error)
+
+        return cells
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import threading
+import time
+
+import WX_Metrics
+from WX_Snapshot import WX_Snapshot
+
+'''
+###########################################
+# PURPOSE: runs the Pull/Analyze loop     #
+#          once and pushes the status to  #
+#          every WX_View that's listening,#
+#          so a room full of screens      #
+#          costs the same as one          #
+###########################################
+'''
+
+'''
+Holds the latest snapshot, already turned into the bytes every client gets, and wakes up the clients waiting on it.
+A client that falls behind just gets the newest snapshot - there's no backlog to work through.
+'''
+class Publisher:
+
+    # initialize class fields
+    version = 0                 # goes up by one every time the snapshot changes, and is the event id clients see
+    body = b'{}'                # the snapshot as JSON
+    etag = '"0"'                # the ETag of body
+    event = b''                 # the snapshot as a Server-Sent Event
+
+    def __init__(self):
+        self.changed = threading.Condition()
+
+    '''
+    Publishes a snapshot if it's different from the last one. Returns True if it was
+    '''
+    def Publish(self, snapshot):
+
+        content = json.dumps(snapshot, sort_keys=True, separators=(',', ':'))
+
+        with self.changed:
+            etag = '"' + hashlib.sha1(content.encode()).hexdigest() + '"'
+            if etag == self.etag:
+                return False
+
+            # when it changed, which isn't part of the ETag so an unchanged cycle doesn't look like news
+            snapshot = dict(snapshot, updated=time.time())
+            body = json.dumps(snapshot, separators=(',', ':'))
+
+            self.version += 1
+            self.body = body.encode()
+            self.etag = etag
+            self.event = f"id: {self.version}\nevent: status\ndata: {body}\n\n".encode()
+            self.changed.notify_all()
+
+        return True
+
+    '''
+    Waits for a snapshot newer than version. Returns (version, event), or (version, None) if timeout ran out first
+    '''
+    def Wait(self, version, timeout):
+
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            if self.version == version:
+                return version, None
+            return self.version, self.event
+
+
+'''
+Answers the WX_View clients:
+    /status.json    the latest snapshot, with an ETag so a client that already has it gets a 304
+    /events         a Server-Sent Events stream that gets every new snapshot as it's published
+    /metrics        the loop's timings and counts as Prometheus text (/metrics.json for JSON)
+'''
+class Status_Handler(http.server.BaseHTTPRequestHandler):
+
+    publisher = None            # the Publisher to serve from
+    metrics = None              # the WX_Metrics of the controller the loop is running
+    keepalive = 15              # seconds between comments on a quiet event stream, so proxies don't drop it
+
+    def do_GET(self):
+
+        path = self.path.split('?')[0]
+        if path == '/status.json':
+            self.Send_Status()
+        elif path == '/events':
+            self.Send_Events()
+        elif not WX_Metrics.Send(self, self.metrics, path):
+            self.send_error(404)
+
+    '''
+    Sends the latest snapshot, or 304 if the client's copy is current
+    '''
+    def Send_Status(self):
+
+        publisher = self.publisher
+        body, etag = publisher.body, publisher.etag
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    '''
+    Streams every new snapshot until the client goes away. A reconnecting client sends the id of the last event it
+    got, and only gets the current snapshot again if it's missed one.
+    '''
+    def Send_Events(self):
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        try:
+            version = int(self.headers.get('Last-Event-ID', -1))
+        except ValueError:
+            version = -1
+
+        try:
+            # tell the browser to wait a few seconds before reconnecting if we go away
+            self.wfile.write(b"retry: 5000\n\n")
+            while True:
+                version, event = self.publisher.Wait(version, self.keepalive)
+                self.wfile.write(event if event is not None else b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    # every client asking every few seconds would bury everything else
+    def log_message(self, format, *args):
+        pass
+
+
+'''
+Runs one WX_Controller on its scheduler with WX_Controller.Cycle, the same as WX_Model's main loop, and publishes a snapshot after
+every cycle that brought in something new.
+
+Parameters:
+    publisher is the Publisher to publish to
+    controller is the WX_Controller to run (a new one is default)
+    scheduler is the WX_Scheduler to run it on (a new one is default)
+    stop is a threading.Event that ends the loop when it's set
+'''
+def Run_Loop(publisher, controller=None, scheduler=None, stop=None):
+
+    from WX_Model import WX_Controller
+    from WX_Profile import WX_Profile
+    from WX_Scheduler import WX_Scheduler
+
+    G = controller or WX_Controller()
+    S = scheduler or WX_Scheduler()
+    P = WX_Profile()
+    W = WX_Snapshot('server')
+    stop = stop or threading.Event()
+
+    if P.every:
+        G.profiler = P
+    G.Start_Sampling()
+
+    while not stop.is_set():
+        # wait until the next source is due
+        sources, when = S.Next()
+        if stop.wait(max(0, when - time.time())):
+            break
+
+        with P.Cycle():
+            if not G.Cycle(sources, S):
+                continue
+
+            with G.metrics.Time('publish'):
+                snapshot = G.Snapshot()
+                publisher.Publish(snapshot)
+
+            with G.metrics.Time('save_snapshot') as timing:
+                try:
+                    W.Save(snapshot)
+                except Exception as e:
+                    print(f"Couldn't save the snapshot: {e}")
+                    timing.result = 'error'
+
+'''
+Starts the server. Returns the server, with the loop running behind it
+
+Parameters:
+    host and port are where to listen (WX_SERVER_PORT, or 8040, on every interface is default)
+'''
+def Start_Server(host='', port=None, controller=None, scheduler=None):
+
+    if port is None:
+        port = int(os.environ.get('WX_SERVER_PORT', 8040))
+
+    # the controller is made here, rather than in the loop, so its metrics can be served right away
+    if controller is None:
+        from WX_Model import WX_Controller
+        controller = WX_Controller()
+
+    # clients get the last snapshot from before the restart right away, marked stale, until the first cycle is done
+    publisher = Publisher()
+    last = WX_Snapshot('server').Load()
+    if last is not None:
+        publisher.Publish(dict(last['snapshot'], stale=True, saved=last['saved']))
+
+    handler = type('Publishing_Handler', (Status_Handler,), {'publisher': publisher, 'metrics': controller.metrics})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    server.publisher = publisher
+    server.stop = threading.Event()
+    threading.Thread(target=Run_Loop, args=(publisher, controller, scheduler, server.stop),
+                     name='WX_Loop', daemon=True).start()
+
+    return server
+
+
+'''
+Starts the program
+'''
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Publish the flying status to WX_View clients")
+    parser.add_argument('--host', default='', help="the interface to listen on (every one is default)")
+    parser.add_argument('--port', type=int, default=None, help="the port to listen on (WX_SERVER_PORT or 8040)")
+    args = parser.parse_args()
+
+    server = Start_Server(args.host, args.port)
+    print(f"Publishing on port {server.server_port}: /status.json and /events")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop.set()
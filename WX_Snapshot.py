@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import hashlib
+import io
+import json
+import os
+import time
+
+'''
+###########################################
+# PURPOSE: saves the last status and the  #
+#          frame it was drawn in every    #
+#          cycle, so a restart can put    #
+#          them back on the screen right  #
+#          away                           #
+###########################################
+'''
+
+'''
+Writes data to path so that anyone reading path sees either the old file or the new one, never half of either. It's
+written to a temporary file next to path first, flushed to disk, and then renamed over path.
+'''
+def Write_Atomic(path, data):
+
+    folder = os.path.dirname(path) or '.'
+    temporary = os.path.join(folder, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+    # the rename itself only survives a power cut once the folder is on disk too
+    try:
+        descriptor = os.open(folder, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+    except OSError:
+        pass
+
+
+'''
+The last cycle's snapshot, what was handed to the display and the frame it was drawn in, kept on disk as name.json
+and name.png. The frame is written first and the JSON records its hash, so a crash between the two can't pair a
+status with the wrong frame - the frame is just left out when it doesn't match.
+'''
+class WX_Snapshot:
+
+    # initialize class fields
+    root = os.environ.get('WX_SNAPSHOT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot')
+    max_age = 6 * 3600          # Seconds a saved snapshot is still worth showing. Anything older is ignored
+
+    '''
+    Parameters:
+        name is what the files are called, so the kiosk and WX_Server can keep their own ('display' is default)
+        root is the folder they go in (WX_SNAPSHOT_DIR, or snapshot/ next to this file, is default)
+    '''
+    def __init__(self, name='display', root=None):
+
+        if root is not None:
+            self.root = root
+
+        self.json_path = os.path.join(self.root, name + '.json')
+        self.frame_path = os.path.join(self.root, name + '.png')
+        self.frame_hash = None      # the hash of the frame on disk
+
+        os.makedirs(self.root, exist_ok=True)
+
+    '''
+    Saves a cycle
+
+    Parameters:
+        snapshot is WX_Controller.Snapshot()
+        payload is what Give_To_Display handed over (nothing is default)
+        frame is the PIL image it was drawn in (the frame already saved is default)
+    '''
+    def Save(self, snapshot, payload=None, frame=None):
+
+        if frame is not None:
+            data = io.BytesIO()
+            frame.save(data, format='PNG', compress_level=1)
+            data = data.getvalue()
+            Write_Atomic(self.frame_path, data)
+            self.frame_hash = hashlib.sha1(data).hexdigest()
+
+        saved = {'saved': time.time(),
+                 'snapshot': snapshot,
+                 'payload': payload,
+                 'frame_hash': self.frame_hash}
+        Write_Atomic(self.json_path, json.dumps(saved, separators=(',', ':')).encode())
+
+    '''
+    Loads the last cycle that was saved. Returns a dict with 'saved' (the time), 'snapshot', 'payload' and 'frame'
+    (a PIL image, or None if it's missing or doesn't go with the rest), or None if there's nothing recent to load
+    '''
+    def Load(self):
+
+        try:
+            with open(self.json_path, 'rb') as file:
+                saved = json.loads(file.read())
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Couldn't load the last snapshot: {e}")
+            return None
+
+        if time.time() - saved.get('saved', 0) > self.max_age:
+            return None
+
+        saved['frame'] = None
+        if saved.get('frame_hash') is not None:
+            try:
+                with open(self.frame_path, 'rb') as file:
+                    data = file.read()
+
+                if hashlib.sha1(data).hexdigest() == saved['frame_hash']:
+                    from PIL import Image       # only needed when there's a frame to show
+                    saved['frame'] = Image.open(io.BytesIO(data))
+                    saved['frame'].load()
+                    self.frame_hash = saved['frame_hash']
+            except Exception as e:
+                print(f"Couldn't load the last frame: {e}")
+
+        return saved
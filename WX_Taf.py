@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+import datetime
+import re
+from typing import NamedTuple, Optional
+
+import WX_Rules
+import WX_Metar
+
+'''
+###########################################
+# PURPOSE: reads TAFs and runs every hour #
+#          of them through WX_Rules ahead #
+#          of time, so asking about later #
+#          today is a lookup              #
+###########################################
+'''
+
+_issued = re.compile(r'(\d{2})(\d{2})(\d{2})Z$')
+_valid = re.compile(r'(\d{2})(\d{2})/(\d{2})(\d{2})$')
+_from = re.compile(r'FM(\d{2})(\d{2})(\d{2})$')
+_prob = re.compile(r'PROB(\d{2})$')
+
+CLEAR_SKIES = ('SKC', 'NSC', 'CLR', 'CAVOK')     # sky groups that mean there's no ceiling
+SKIPPED = ('WS', 'TX', 'TN', 'QNH')                # groups that start with these don't matter to the rules
+
+ERROR = ('Error', 'grey', (None,) * 4)            # what an hour gets when its conditions can't be evaluated
+
+
+'''
+One period of a TAF: the base forecast, a FM or BECMG change, or a TEMPO or PROB. Times are in seconds since the
+epoch. Anything the period doesn't forecast is None, and carries over from the period before it.
+'''
+class TAF_Period(NamedTuple):
+
+    kind: str                                   # 'BASE', 'FM', 'BECMG', 'TEMPO', 'PROB30', 'PROB40 TEMPO', ...
+    start: float
+    end: float
+    ceiling_ft: Optional[float] = None          # WX_Rules.UNLIMITED_CEILING when the sky is forecast clear
+    visibility_sm: Optional[float] = None
+    wind_kt: Optional[float] = None
+    gust_kt: Optional[float] = None             # None with a wind means no gust
+    wind_dir_deg: Optional[float] = None
+    raw: Optional[str] = None                   # the period's groups as they are in the TAF
+
+
+'''
+A station's TAF. raw is the whole TAF on one line, so an amended TAF never matches the one it replaced.
+'''
+class TAF_Forecast(NamedTuple):
+
+    station: Optional[str] = None
+    issued: Optional[float] = None
+    valid_from: Optional[float] = None
+    valid_to: Optional[float] = None
+    periods: tuple = ()
+    raw: Optional[str] = None
+
+
+'''
+The status for every hour a TAF covers, worked out once when it's read. At is a subtraction and an index.
+'''
+class TAF_Timeline:
+
+    '''
+    Parameters:
+        start is the first hour, in seconds since the epoch
+        hours are (status, background_color, word_colors) for each hour from start, like WX_Rules.Evaluate's
+    '''
+    def __init__(self, start=0, hours=()):
+        self.start = start
+        self.hours = tuple(hours)
+
+    '''
+    Gets (status, background_color, word_colors) for the hour t falls in, or None if the TAF doesn't cover it
+
+    Parameter:
+        t is in seconds since the epoch
+    '''
+    def At(self, t):
+
+        hour = int((t - self.start) // 3600)
+        if 0 <= hour < len(self.hours):
+            return self.hours[hour]
+        return None
+
+    '''
+    Gets every hour as plain values json can store: [start, status, background_color]
+    '''
+    def JSON(self):
+        return [[self.start + hour * 3600, status, background_color]
+                for hour, (status, background_color, word_colors) in enumerate(self.hours)]
+
+
+'''
+Turns a day, hour and minute from a TAF into seconds since the epoch. The TAF doesn't say the month, so it's the one
+that puts it closest to reference. Hour 24 is midnight at the end of the day.
+'''
+def _when(day, hour, minute, reference):
+
+    best = None
+    for offset in (-1, 0, 1):
+        year, month = reference.year, reference.month + offset
+        if month == 0:
+            year, month = year - 1, 12
+        elif month == 13:
+            year, month = year + 1, 1
+
+        try:
+            t = datetime.datetime(year, month, day, tzinfo=datetime.timezone.utc)
+        except ValueError:
+            continue
+        t += datetime.timedelta(hours=hour, minutes=minute)
+
+        if (best is None) or (abs(t - reference) < abs(best - reference)):
+            best = t
+
+    return best.timestamp() if best is not None else None
+
+'''
+Reads one period's groups, e.g. ['32010G20KT', 'P6SM', 'BKN040'], into a TAF_Period. The weather itself is read
+by WX_Metar, which already knows every group a TAF shares with a METAR.
+'''
+def _period(kind, start, end, groups, station):
+
+    groups = [group for group in groups if not group.startswith(SKIPPED)]
+    conditions = WX_Metar.Parse_METAR(' '.join([station or 'TAF'] + groups))
+
+    # WX_Metar counts no sky groups as no ceiling, but here it means the sky isn't changing. A ceiling forecast with
+    # no height (OVC///) can't be ruled out as low, so it's taken as on the ground
+    ceiling = None
+    if conditions.layers or any(group in CLEAR_SKIES for group in groups):
+        ceiling = conditions.ceiling_ft if conditions.ceiling_ft is not None else 0.0
+
+    return TAF_Period(kind=kind,
+                      start=start,
+                      end=end,
+                      ceiling_ft=ceiling,
+                      visibility_sm=conditions.visibility_sm,
+                      wind_kt=conditions.wind_kt,
+                      gust_kt=conditions.gust_kt,
+                      wind_dir_deg=conditions.wind_dir_deg,
+                      raw=' '.join(groups))
+
+'''
+Reads a raw TAF into a TAF_Forecast. Anything it doesn't recognize is skipped.
+
+Parameters:
+    raw is the TAF, with or without TAF/AMD/COR in front, on one line or many
+    now is the time the TAF's days are counted from (the current UTC time is default)
+'''
+def Parse_TAF(raw, now=None):
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    tokens = raw.split()
+    count = len(tokens)
+    i = 0
+
+    while (i < count) and (tokens[i] in ('TAF', 'AMD', 'COR')):
+        i += 1
+
+    station = tokens[i] if i < count else None
+    i += 1
+
+    issued = None
+    if i < count:
+        match = _issued.match(tokens[i])
+        if match is not None:
+            issued = _when(*(int(group) for group in match.groups()), now)
+            i += 1
+
+    # the rest of the TAF's times are counted from when it was issued
+    reference = datetime.datetime.fromtimestamp(issued, datetime.timezone.utc) if issued is not None else now
+
+    valid_from = valid_to = None
+    if i < count:
+        match = _valid.match(tokens[i])
+        if match is not None:
+            day, hour, end_day, end_hour = (int(group) for group in match.groups())
+            valid_from = _when(day, hour, 0, reference)
+            valid_to = _when(end_day, end_hour, 0, reference)
+            i += 1
+
+    # split the rest into periods: (kind, start, end, groups)
+    periods = [['BASE', valid_from, valid_to, []]]
+    while i < count:
+        token = tokens[i]
+        i += 1
+
+        if token == 'RMK':
+            break
+
+        match = _from.match(token)
+        if match is not None:
+            day, hour, minute = (int(group) for group in match.groups())
+            periods.append(['FM', _when(day, hour, minute, reference), valid_to, []])
+            continue
+
+        kind = None
+        if token in ('BECMG', 'TEMPO'):
+            kind = token
+        elif _prob.match(token):
+            kind = token
+            if (i < count) and (tokens[i] == 'TEMPO'):
+                kind += ' TEMPO'
+                i += 1
+
+        if kind is not None:
+            start = end = None
+            if i < count:
+                match = _valid.match(tokens[i])
+                if match is not None:
+                    day, hour, end_day, end_hour = (int(group) for group in match.groups())
+                    start = _when(day, hour, 0, reference)
+                    end = _when(end_day, end_hour, 0, reference)
+                    i += 1
+            periods.append([kind, start, end, []])
+            continue
+
+        periods[-1][3].append(token)
+
+    # a FM period lasts until the next one takes over
+    changes = [period for period in periods if period[0] == 'FM']
+    for period, following in zip(changes, changes[1:]):
+        period[2] = following[1]
+
+    return TAF_Forecast(station=station,
+                        issued=issued,
+                        valid_from=valid_from,
+                        valid_to=valid_to,
+                        periods=tuple(_period(kind, start, end, groups, station)
+                                      for kind, start, end, groups in periods if start is not None),
+                        raw=' '.join(tokens))
+
+'''
+Splits text with TAFs in it, like the API's format=raw, into one TAF per string, each on one line. A TAF's lines
+after its first are indented, so every line that isn't starts a new one.
+'''
+def Split(text):
+
+    tafs = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if line[0].isspace() and tafs:
+            tafs[-1].extend(line.split())
+        else:
+            tafs.append(line.split())
+
+    return [' '.join(tokens) for tokens in tafs]
+
+'''
+Reads every TAF in text. Returns a list of TAF_Forecasts
+'''
+def Parse_Many(text, now=None):
+
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return [Parse_TAF(raw, now) for raw in Split(text)]
+
+
+'''
+Puts conditions over the ones before them. Anything a period doesn't forecast carries over, and a wind always comes
+with its gust
+'''
+def _apply(conditions, period):
+
+    ceiling, visibility, wind, gust = conditions
+    if period.ceiling_ft is not None:
+        ceiling = period.ceiling_ft
+    if period.visibility_sm is not None:
+        visibility = period.visibility_sm
+    if period.wind_kt is not None:
+        wind, gust = period.wind_kt, period.gust_kt
+
+    return ceiling, visibility, wind, gust
+
+'''
+Puts conditions in their bands with WX_Rules. Returns the band indices (ceiling, visibility, wind, gust)
+'''
+def _classify(conditions):
+
+    ceiling, visibility, wind, gust = conditions
+    return WX_Rules.Classify(ceiling, visibility, *WX_Rules.Worst_Wind(wind, gust)[:2])
+
+'''
+Gets the result for an hour that sees every one of the sets of conditions. Each condition is taken at its most severe
+band across all of them, so a TEMPO's low ceiling and the prevailing high wind both count even if they're in different
+sets. The most severe band isn't always the highest one - a ceiling or visibility is worst in its lowest band.
+Returns (status, background_color, word_colors), or ERROR if any of them can't be read
+'''
+def _evaluate(seen):
+
+    try:
+        bands = [_classify(conditions) for conditions in seen]
+    except (TypeError, ValueError):
+        return ERROR
+
+    return WX_Rules.Lookup(tuple(max(band, key=lambda b: condition[1][b][0])
+                                 for condition, band in zip(WX_Rules.CONDITIONS, zip(*bands))))
+
+'''
+Works out the status for every hour of a TAF. Each hour gets the worst band of each condition forecast at any point
+in it: what's prevailing when it starts, every FM or BECMG change during it (a BECMG counts from when it starts
+becoming), and every TEMPO or PROB on top of those. Returns a TAF_Timeline
+'''
+def Build_Timeline(forecast):
+
+    if (forecast.valid_from is None) or (forecast.valid_to is None):
+        return TAF_Timeline()
+
+    changes = [period for period in forecast.periods if period.kind in ('BASE', 'FM', 'BECMG')]
+    temporary = [period for period in forecast.periods if period.kind not in ('BASE', 'FM', 'BECMG')]
+
+    conditions = (WX_Rules.UNLIMITED_CEILING, None, None, None)
+    hours = []
+    next_change = 0
+    start = forecast.valid_from - forecast.valid_from % 3600
+
+    for hour in range(int(-(-(forecast.valid_to - start) // 3600))):
+        begin = start + hour * 3600
+        end = begin + 3600
+
+        # the changes that have started by the end of this hour, each one a set of conditions the hour sees
+        seen = [conditions]
+        while (next_change < len(changes)) and (changes[next_change].start < end):
+            conditions = _apply(conditions, changes[next_change])
+            if changes[next_change].start <= begin:
+                seen[0] = conditions
+            else:
+                seen.append(conditions)
+            next_change += 1
+
+        for period in temporary:
+            if (period.start < end) and ((period.end is None) or (period.end > begin)):
+                seen.append(_apply(conditions, period))
+
+        hours.append(_evaluate(seen))
+
+    return TAF_Timeline(start, hours)
@@ -1,37 +1,95 @@
+import asyncio
 import json
 import time
-import datetime
-import asyncio
-import re
-import os
-import sys
-import WX_Model
-from pyscript import document   
+from pyscript import document, window
+from pyodide.ffi import create_proxy, create_once_callable
 
-def main():
+# Where WX_Server is publishing. Every open page listens to the same server instead of fetching and analyzing
+# the weather on its own
+SERVER_URL = "http://localhost:8040"
+AGE_EVERY = 30      # seconds between updates of how long ago the status changed, when nothing new comes in
+
+source = None       # the EventSource, kept so it isn't garbage collected
+latest = None       # the newest snapshot from the server
+arrived = None      # an asyncio.Event set when a new snapshot comes in
+shown = {}          # the text on the page right now, by element id, so only what changed gets written
+
+'''
+Works out the text for every element from a snapshot, by element id
+'''
+def texts(snapshot):
+
+    # the same text the kiosk draws, e.g. "Ceiling: Unlimited" and "--" for anything that wasn't reported
+    display = snapshot['display']
+
+    # a stale snapshot is the last one from before the server restarted, and is as old as when it was saved
+    if snapshot.get('stale'):
+        minutes = int((time.time() - snapshot['saved']) // 60)
+        last_update = f"Last known {minutes} min ago - updating..."
+    else:
+        minutes = int((time.time() - snapshot['updated']) // 60)
+        last_update = "Updated just now" if minutes < 1 else f"Updated {minutes} min ago"
+
+    return {"ceiling": display['ceiling'],
+            "visibility": display['visibility'],
+            "last_update": last_update,
+            "metar": display['metar'] or '',
+            "status": display['status']}  # ends in an arrow - up: \u2191, sideways: \u2194, down: \u2193
+
+'''
+Waits for the browser's next animation frame
+'''
+def next_frame():
 
-    document.querySelector("#ceiling").innerText = "Look! A ceiling!"
-    document.querySelector("#visibility").innerText = "It worked! I can see!"
-    document.querySelector("#last_update").innerText = "I have never updated anything"
-    document.querySelector("#metar").innerText = "metar"
-    document.querySelector("#status").innerText = "Good To Fly \u2191"
-    # sideways arrow: \u2194
-    # up arrow: \u2191
-    # down arrow: \u2193
+    frame = asyncio.get_running_loop().create_future()
+    window.requestAnimationFrame(create_once_callable(lambda timestamp: frame.set_result(timestamp)))
+    return frame
+
+'''
+Keeps the page up to date. It sleeps until a snapshot comes in (or it's time to update the age), then writes only
+the elements whose text changed, all in one animation frame. Nothing here blocks, so the page stays responsive.
+'''
+async def refresh():
+
+    while True:
+        try:
+            await asyncio.wait_for(arrived.wait(), AGE_EVERY)
+        except asyncio.TimeoutError:
+            pass
+        arrived.clear()
+
+        if latest is None:
+            continue
+
+        changes = {key: text for key, text in texts(latest).items() if shown.get(key) != text}
+        if not changes:
+            continue
+
+        await next_frame()
+        for key, text in changes.items():
+            document.getElementById(key).innerText = text
+        shown.update(changes)
+
+'''
+Gets a status event from the server
+'''
+def on_status(event):
+
+    global latest
+    latest = json.loads(event.data)
+    arrived.set()
+
+def main():
 
-    # inititalize the model
-    G = WX_Model()
-    
-    #while (True):
-        # pull the data
-    #    paragraph_p.text = G.Pull()
+    global source, arrived
+    arrived = asyncio.Event()
 
-        # analyze the data
-        #G.Analyze()
+    # the browser reconnects on its own if the server goes away, and picks up where it left off
+    source = window.EventSource.new(SERVER_URL + "/events")
+    source.addEventListener("status", create_proxy(on_status))
 
-        # wait for three minutes, then repeat
-    #    time.sleep(180)
+    return asyncio.ensure_future(refresh())
 
 # IDK what this is but the program doesn't work without it
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
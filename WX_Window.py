@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import collections
+import math
+import threading
+from typing import NamedTuple, Optional
+
+'''
+###########################################
+# PURPOSE: rolling wind and gust stats    #
+#          over the last few minutes of   #
+#          Teal HQ samples, kept up to    #
+#          date one sample at a time      #
+###########################################
+'''
+
+'''
+The stats over a window of samples. Speeds are in whatever unit the samples were, directions in degrees. Anything
+there weren't samples for is None.
+'''
+class Wind_Stats(NamedTuple):
+
+    samples: int = 0
+    mean_wind: Optional[float] = None
+    wind_variance: Optional[float] = None
+    max_gust: Optional[float] = None
+    mean_direction: Optional[float] = None      # the circular mean, so 350 and 10 average to 0
+    direction_spread: Optional[float] = None    # the circular standard deviation. 0 is steady, it grows as it swings
+
+
+'''
+The last seconds of wind samples in a fixed-size ring buffer. Adding a sample updates every stat in O(1) (amortized,
+for the samples that age out), and Stats just reads them off:
+    mean and variance from running sums of the wind and its square
+    max gust from a deque of gusts that only decreases, so the biggest is always at the front
+    direction from running sums of the sine and cosine of each direction
+Samples older than seconds, or past capacity, fall out of the window.
+'''
+class Wind_Window:
+
+    '''
+    Parameters:
+        seconds is how far back the window goes
+        capacity is the most samples it holds
+    '''
+    def __init__(self, seconds=600, capacity=1024):
+
+        self.seconds = seconds
+        self.capacity = capacity
+        self.ring = [None] * capacity           # (time, wind, gust, direction in radians) for every sample
+        self.head = 0                           # where the oldest sample is
+        self.count = 0
+
+        self.winds = 0                          # how many samples had a wind
+        self.wind_sum = 0.0
+        self.wind_squares = 0.0
+        self.directions = 0                     # how many samples had a direction
+        self.sin_sum = 0.0
+        self.cos_sum = 0.0
+        self.gusts = collections.deque()        # (time, gust), biggest first and decreasing
+
+        self.lock = threading.Lock()
+
+    '''
+    Adds a sample. Anything that wasn't reported can be None
+
+    Parameters:
+        t is when it was taken, in seconds
+        direction is in degrees
+    '''
+    def Add(self, t, wind, gust=None, direction=None):
+
+        radians = math.radians(direction) if direction is not None else None
+
+        with self.lock:
+            self._Expire(t - self.seconds)
+            if self.count == self.capacity:
+                self._Drop()
+
+            self.ring[(self.head + self.count) % self.capacity] = (t, wind, gust, radians)
+            self.count += 1
+
+            if wind is not None:
+                self.winds += 1
+                self.wind_sum += wind
+                self.wind_squares += wind * wind
+
+            if radians is not None:
+                self.directions += 1
+                self.sin_sum += math.sin(radians)
+                self.cos_sum += math.cos(radians)
+
+            # a gust can never be the max again once a bigger one comes in after it
+            if gust is not None:
+                while self.gusts and self.gusts[-1][1] <= gust:
+                    self.gusts.pop()
+                self.gusts.append((t, gust))
+
+    '''
+    Gets the stats over the window. Returns a Wind_Stats
+
+    Parameter:
+        now drops samples older than the window first (nothing is dropped is default)
+    '''
+    def Stats(self, now=None):
+
+        with self.lock:
+            if now is not None:
+                self._Expire(now - self.seconds)
+
+            stats = {'samples': self.count}
+
+            if self.winds:
+                mean = self.wind_sum / self.winds
+                stats['mean_wind'] = mean
+                stats['wind_variance'] = max(0.0, self.wind_squares / self.winds - mean * mean)
+
+            if self.gusts:
+                stats['max_gust'] = self.gusts[0][1]
+
+            if self.directions:
+                # how closely the directions agree, from 0 (all over) to 1 (all the same). Rounding can push it past 1
+                length = min(1.0, math.hypot(self.sin_sum, self.cos_sum) / self.directions)
+                stats['mean_direction'] = math.degrees(math.atan2(self.sin_sum, self.cos_sum)) % 360
+                if length > 1e-12:
+                    stats['direction_spread'] = math.degrees(math.sqrt(max(0.0, -2 * math.log(length))))
+                else:
+                    stats['direction_spread'] = 180.0
+
+            return Wind_Stats(**stats)
+
+    '''
+    Drops samples taken before oldest
+    '''
+    def _Expire(self, oldest):
+        while self.count and (self.ring[self.head][0] < oldest):
+            self._Drop()
+
+    '''
+    Drops the oldest sample, taking it back out of the sums
+    '''
+    def _Drop(self):
+
+        t, wind, gust, radians = self.ring[self.head]
+        self.ring[self.head] = None
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+
+        if wind is not None:
+            self.winds -= 1
+            self.wind_sum -= wind
+            self.wind_squares -= wind * wind
+
+        if radians is not None:
+            self.directions -= 1
+            self.sin_sum -= math.sin(radians)
+            self.cos_sum -= math.cos(radians)
+
+        # the oldest gust is only still in the deque if nothing bigger came after it
+        if self.gusts and (self.gusts[0][0] == t):
+            self.gusts.popleft()
+
+        # start the sums over when the window empties, so rounding errors don't build up forever
+        if self.count == 0:
+            self.wind_sum = self.wind_squares = self.sin_sum = self.cos_sum = 0.0
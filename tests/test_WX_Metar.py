@@ -0,0 +1,17 @@
+import WX_Metar
+import WX_Rules
+
+
+def test_unknown_ceiling_height_is_unknown_ceiling():
+
+    fields = WX_Metar.Parse_METAR('KSLC 251853Z AUTO 32005KT 10SM OVC/// 08/M03')
+
+    assert fields.ceiling_ft is None
+    assert fields.layers == (('OVC', None),)
+
+
+def test_unknown_layer_above_a_known_ceiling():
+
+    assert WX_Metar.Parse_METAR('KSLC 251853Z 32005KT 10SM BKN030 OVC/// 08/M03').ceiling_ft == 3000
+    assert WX_Metar.Parse_METAR('KSLC 251853Z 32005KT 10SM VV/// BKN030 08/M03').ceiling_ft is None
+    assert WX_Metar.Parse_METAR('KSLC 251853Z 32005KT 10SM FEW/// 08/M03').ceiling_ft == WX_Rules.UNLIMITED_CEILING
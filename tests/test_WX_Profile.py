@@ -0,0 +1,27 @@
+import WX_Profile
+
+
+class _Busy_Profile:
+
+    # what cProfile.Profile does from Python 3.12 while another profiler is running
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+
+
+def test_wrap_runs_the_function_when_profiling_is_taken(monkeypatch, tmp_path):
+
+    profiler = WX_Profile.WX_Profile(every=1, root=str(tmp_path))
+    profiler.active = []
+    monkeypatch.setattr(WX_Profile.cProfile, 'Profile', _Busy_Profile)
+
+    assert profiler.Wrap(lambda a, b: a + b)(1, 2) == 3
+    assert profiler.active == []
+
+
+def test_wrap_profiles_the_thread_when_it_can(tmp_path):
+
+    profiler = WX_Profile.WX_Profile(every=1, root=str(tmp_path))
+    profiler.active = []
+
+    assert profiler.Wrap(lambda a, b: a + b)(1, 2) == 3
+    assert len(profiler.active) == 1
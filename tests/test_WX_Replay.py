@@ -0,0 +1,36 @@
+import numpy as np
+
+import WX_Rules
+import WX_Replay
+
+
+def test_missing_wind_is_do_not_fly_like_analyze():
+
+    nan = float('nan')
+    rules, statuses = WX_Replay.Evaluate(np.array([5000.0, 5000.0]), np.array([10.0, 10.0]),
+                                         np.array([5.0, nan]), np.array([nan, nan]),
+                                         np.array([nan, 6.0]), np.array([nan, nan]))
+
+    # Analyze uses 99999 for the wind and gust when the station has no wind, even with Teal HQ's
+    assert rules.tolist() == [WX_Rules.Index(WX_Rules.Classify(5000, 10, 5, 0)),
+                              WX_Rules.Index(WX_Rules.Classify(5000, 10, 99999, 99999))]
+    assert statuses.tolist() == [0, 2]
+
+
+def test_unknown_ceiling_is_error_like_analyze():
+
+    rules, statuses = WX_Replay.Evaluate(np.array([float('nan')]), np.array([10.0]), np.array([5.0]),
+                                         np.array([0.0]))
+
+    assert rules.tolist() == [-1]
+    assert statuses.tolist() == [WX_Replay.ERROR]
+
+
+def test_csv_empty_ceiling_is_unlimited(tmp_path):
+
+    archive = tmp_path / 'archive.csv'
+    archive.write_text("time,ceiling,visibility,wind,gust\n0,,10,5,\n3600,M,10,5,\n")
+
+    ceiling = WX_Replay.Load_CSV(str(archive))['ceiling']
+    assert ceiling[0] == WX_Rules.UNLIMITED_CEILING
+    assert np.isnan(ceiling[1])
@@ -0,0 +1,47 @@
+import datetime
+import os
+
+import WX_Rules
+import WX_Taf
+
+NOW = datetime.datetime(2023, 11, 25, 18, 0, tzinfo=datetime.timezone.utc)
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+GOOD = (WX_Rules.STATUSES[0], 'green', (None, None, None, None))
+
+
+def _timeline(raw):
+    return WX_Taf.Build_Timeline(WX_Taf.Parse_TAF(raw, NOW))
+
+
+def test_tempo_low_ceiling_over_clear_base():
+
+    timeline = _timeline('TAF KSLC 251720Z 2518/2524 32005KT P6SM SKC TEMPO 2520/2522 1/2SM FG VV002')
+
+    fog = (WX_Rules.STATUSES[2], 'red', ('pink', 'pink', None, None))
+    assert timeline.hours == (GOOD, GOOD, fog, fog, GOOD, GOOD)
+
+
+def test_prob_low_ceiling_keeps_the_prevailing_wind():
+
+    timeline = _timeline('TAF KSLC 251720Z 2518/2524 32014G20KT P6SM SKC PROB30 2520/2522 1SM TSRA OVC004')
+
+    assert timeline.hours[0] == (WX_Rules.STATUSES[1], 'yellow', (None, None, 'orange', 'orange'))
+    assert timeline.hours[2] == (WX_Rules.STATUSES[2], 'red', ('pink', 'pink', 'orange', 'orange'))
+    assert timeline.hours[4] == timeline.hours[0]
+
+
+def test_fixture_prob30_ceiling_is_pink():
+
+    with open(os.path.join(FIXTURES, 'taf.txt')) as handle:
+        forecast = [taf for taf in WX_Taf.Parse_Many(handle.read(), NOW) if taf.station == 'KSLC'][0]
+
+    prob = [period for period in forecast.periods if period.kind == 'PROB30'][0]
+    assert WX_Taf.Build_Timeline(forecast).At(prob.start)[2][0] == 'pink'
+
+
+def test_unknown_ceiling_height_is_taken_as_low():
+
+    timeline = _timeline('TAF KSLC 251720Z 2518/2520 32005KT P6SM OVC///')
+
+    assert timeline.hours[0][2][0] == 'pink'